@@ -1,81 +1,59 @@
-# send()
-# recv()
-import socket
 import time
-import thread
-import serial
-from robot_interface.alan_robot import AlanRobot
-from scipy.interpolate import interp1d
-import numpy as np
-
-# Step 1
-sock = socket.socket()
+from robot_interface.launcher import RobotLauncher
+from robot_interface.furhat_client import FurhatClient
+from robot_interface.dispatcher import BehaviourDispatcher
+from robot_interface import furhat_events
+from robot_models.servo_calibration import ServoCalibration
+from robot_interface import serial_output
+
+# Every robot: the SpiNNaker board it runs on, the Furhat agent it embodies and
+# the serial port of the Arduino driving each of its servo groups. Add a row to
+# drive another robot from the same conversation.
+robot_table = {
+    'luke': {
+        'agent': 'agent1',
+        'ports': {'left_servos': 4, 'right_servos': 5},
+        'parameters': {
+            'hostname': '192.168.240.1',
+            'width': 8,
+            'height': 8
+        }
+    },
+    'leia': {
+        'agent': 'agent2',
+        'ports': {'left_servos': 6, 'right_servos': 7},
+        'parameters': {
+            'hostname': '192.168.240.3',
+            'width': 8,
+            'height': 8
+        }
+    },
+}
+# Whose robot silences whenever Furhat is interrupted, whichever agent the
+# stop event names, as luke always has; the other robots idle
+default_agent = 'agent1'
+
+# Each port is written by its own thread, so a slow or unplugged Arduino
+# never holds up the servo callbacks; ports are reopened if they fail
+serial_outputs = serial_output.SerialOutputManager(max_backoff=5.0)
+for row in robot_table.values():
+    for usbPort in row['ports'].values():
+        serial_outputs.add_port(usbPort, serial_output.serial_port(usbPort))
+#
+
+# Steps 1 to 4: connect to Furhat and subscribe to the speech events. The
+# client receives in its own thread and hands every event to handle_event as
+# soon as it is complete, once the robots are running.
 ip = "127.0.0.1"
 port = 1932
 ticket = "myticket"
-sock.connect((ip, port))
-
-usbPort1 = 4
-usbPort2 = 5
-usbPort3 = 6
-usbPort4 = 7
-
-ser1 = serial.Serial(usbPort1, 57600)
-ser2 = serial.Serial(usbPort2, 57600)
-ser3 = serial.Serial(usbPort3, 57600)
-ser4 = serial.Serial(usbPort4, 57600)
-#
-
-def read(threadName):
-    a = sock.recv(1000)
-    # print(a)
-    if a == None:
-        return ("No event")
-    a = a.decode("utf-8")
-    b = a.splitlines()
-    for i in b:
-        if i == "CONNECTED":
-            print("Succesfully received, CONNECTED")
-    for i in b:
-        c = i.split()
-        if (len(c) > 0 and len(b) > 1):
-            if ((str(c[0]) == "EVENT" or str(c[0]) == "VENT" or str(
-                    c[0]) == "ENT") and (len(c) >= 3)):
-                e = []
-                d = b[1]
-                e.append(c[1])
-                e.append(d)
-                return (e)
-
-
-def send(threadName, sentence=""):
-    sock.send(bytearray(sentence))
-    print("Succesfully sent, ", sentence)
-
-
-# Step 2
-try:
-    thread.start_new_thread(send, ("Send",))
-    send("Send", "CONNECT myticket Python\n")
-except:
-    print ("Error: Could not start sending thread 1")
-time.sleep(1)
-#
-
-# Step 3
-try:
-    thread.start_new_thread(read, ("Receive",))
-    read("Receive")
-except:
-    print ("Error: Could not start receiving thread")
-#
-
-time.sleep(1)
-# Step 4
-send("Send",
-     "SUBSCRIBE action.speech action.speech.stop\n")  # sense.user.enter sense.user.leave action.speech action.speech.stop\n")
-
-interrupted = False
+furhat = FurhatClient(ip, port, ticket,
+                      subscriptions=["action.speech", "action.speech.stop"])  # sense.user.enter sense.user.leave
+furhat.start()
+if furhat.wait_connected(5.):
+    print("Succesfully received, CONNECTED")
+else:
+    print("Error: Furhat did not accept the connection")
 
 static_notification = "===This step is done. You can proceed with follow-up steps==="
 
@@ -83,152 +61,76 @@ print (len(static_notification) * '=')
 print (static_notification)
 print (len(static_notification) * '=')
 
-servo_to_com = dict()
 index_to_range = {0: [101, 150], 1: [51, 100], 2: [151, 155]}
 nengo_radius = 1
+calibration = ServoCalibration(index_to_range, radius=nengo_radius,
+                               max_position=serial_output.MAX_POSITION)
 
-simulation_params_luke = {
-    'hostname': '192.168.240.1',
-    'width': 8,
-    'height': 8
-}
-
-simulation_params_leia = {
-    'hostname': '192.168.240.3',
-    'width': 8,
-    'height': 8
-}
-
-# TODO - Run booting etc. in parallel
-luke = AlanRobot(run_time=86400,
-                 period=10.0,
-                 **simulation_params_luke)  # Run for 24 hours with default period
-# luke = AlanRobot(run_time=15, period=10.0)  # Run for 24 hours with default period
-leia = AlanRobot(run_time=86400,
-                 period=10.0,
-                 **simulation_params_leia)  # Run for 24 hours with default period
-
-
-servo_to_com[
-    AlanRobot.key_with_label_in_container("left_servos", luke.servos)] = ser1
-servo_to_com[
-    AlanRobot.key_with_label_in_container("right_servos", luke.servos)] = ser2
-
-servo_to_com[AlanRobot.key_with_label_in_container("left_servos",
-                                                   leia.servos)] = ser3
-servo_to_com[AlanRobot.key_with_label_in_container("right_servos",
-                                                   leia.servos)] = ser4
+# Boot all the robots in parallel, each running for 24 hours with default
+# period
+launcher = RobotLauncher(dict((name, row['parameters']) for name, row in
+                              robot_table.items()),
+                         run_time=86400, period=10.0)
+robots = launcher.launch()
+print(launcher.timings)
 
+for name, row in robot_table.items():
+    for label, usbPort in row['ports'].items():
+        serial_outputs.route(robots[name].servos.key_with_label(label),
+                             usbPort)
 
 
 def transmission_callback(servo, data):
     '''
     Callback function that sends the relevant data sequentially to the respective controlling Arduinos.
-    More specifically, the data in the servos from Nengo is linearly interpolated into the accepted range for that
-    joint (by indexing into index_to_range and applying interp1d from scipy) and sending the rounded value down the
-    serial point resulting from indexing the servo into servo_to_com.
+    More specifically, the data in the servos from Nengo is clipped and linearly mapped into the accepted range for
+    each joint (by the calibration built from index_to_range) and the positions are queued as a single frame for the
+    serial port the servo group is routed to in robot_table. Only the joints whose position differs from what was last
+    queued for the port are sent, so no change is lost when servo updates are coalesced, and the callback never waits
+    on the serial link.
     :param servo: robot_models.servo
-    :param data: numpy.ndarray
+    :param data: robot_models.servo.ServoUpdate
     :return: None
     '''
-    global index_to_range, servo_to_com, nengo_radius
-
-    # value clipping [-1, 1]
-    data = np.clip(data, -nengo_radius, nengo_radius)
-    for index in xrange(data.size):
-        servo_range = index_to_range[index]
-        interpolation = interp1d([-nengo_radius, nengo_radius], servo_range)
-        com_link = servo_to_com[servo]
+    global calibration, serial_outputs
 
-        interpolated_output = int(interpolation(data[index]))
+    serial_outputs.update(servo, calibration.positions(data.values))
 
-        com_link.write(bytearray(
-            [interpolated_output]
-        ))
 
-luke_moving = False
-leia_moving = False
+for robot in robots.values():
+    robot.servos.set_default_callback(transmission_callback)
 
-
-luke.servos.set_default_callback(transmission_callback)
-leia.servos.set_default_callback(transmission_callback)
+# Which robot does what for each Furhat event; see robot_interface.dispatcher
+dispatcher = BehaviourDispatcher(
+    dict((row['agent'], robots[name]) for name, row in robot_table.items()),
+    default_agent=default_agent)
 
 print("oh my life -------------")
 time.sleep(10)  # <--
-luke.start_simulation()
-leia.start_simulation()
-
-while (1):
-    time.sleep(0.1)
-    a = read("Receive")
-    event = None
-    close = 0
-    try:
-        if a != None:
-            if (a[0] == "action.speech"):
-                b = a[1].split(",")
-                for i in b:
-                    i = str(i)
-                    b = i.split(":")
-                    b[0] = b[0][1:-1]
-                    if (b[0] == "agent"):
-                        b[1] = b[1][1:-1]
-                        agent = b[1]
-                        event = agent
-                        if (event == "agent1" and interrupted == False):
-                            luke_moving = True
-                            leia_moving = False
-                            luke.gesture()
-                            leia.idle()
-
-                            print("agent1 speech sequence")
-                        elif (event == "agent2" and interrupted == False):
-                            luke_moving = False
-                            leia_moving = True
-
-                            leia.gesture()
-                            luke.idle()
-                            print("agent2 speech sequence")
-                    if (b[0] == "display"):
-                        # print b
-                        b[1] = b[1][1:-1]
-                        if (b[1] == " hm what was i saying" or b[
-                            1] == " oh what were you saying?") or "where were we" in b[1].lower():
-                            event = "Interrupt completed"
-                            interrupted = False
-                            luke.idle()
-                            print(event)
-            elif (a[0] == "action.speech.stop"):
-                # TODO some way of knowing which robot is talking? Maybe like this
-                # b = a[1].split(",")
-                # if b[0] == "agent":
-                #     b[1] = b[1][1:-1]
-                #     agent = b[1]
-                #     event = agent
-                #     if (event == "agent1"):
-                #         luke_moving = True
-                #         leia_moving = False
-                #         luke.silence()
-                #         leia.idle()
-                #     elif (event == "agent2"):
-                # luke_moving = False
-                # leia_moving = True
-                #
-
-                event = "Interrupted"
-                interrupted = True
-                # luke_moving = True
-                # leia_moving = False
-                #
-                # luke.silence()
-
-
-                leia.idle()
-                luke.silence()
-                print(event)
-                print "something"
-    except Exception as e:
-        print e
-
-    if (close):
-        send("Send", "CLOSE\n")
+launcher.start()
+
+
+def handle_event(message):
+    '''
+    Act on an event from Furhat as soon as it is received.
+    :param message: robot_interface.furhat_client.FurhatMessage
+    :return: None
+    '''
+    event = furhat_events.parse_event(message)
+    if event is None:
+        print("Malformed event " + str(message.name))
+    elif dispatcher.dispatch(event):
+        print("%s from %s: %s" % (event.name, event.agent, dispatcher.state))
+
+furhat.handler = handle_event
+
+# Events are handled by the client's thread; this one only waits for the end
+try:
+    while not furhat.closed:
+        time.sleep(1)
+except KeyboardInterrupt:
+    pass
+finally:
+    furhat.close()
+    launcher.stop()
+    serial_outputs.close(1.)
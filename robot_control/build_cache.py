@@ -0,0 +1,191 @@
+__author__ = 'Petrut Bogdan'
+
+import hashlib
+import logging
+import os
+import tempfile
+
+import nengo
+import numpy as np
+from nengo.solvers import Solver
+
+logger = logging.getLogger(__name__)
+
+# Change whenever the format of the cache files changes
+CACHE_VERSION = 1
+
+
+class CachedSolver(Solver):
+    def __init__(self, solver, decoders=None):
+        """
+        Decoder solver that returns previously solved decoders when they fit
+        the problem, and otherwise solves with the original solver and keeps
+        the result.
+
+        :param solver: The solver of the connection
+        :type solver: nengo.solvers.Solver
+        :param decoders: Decoders loaded from a cache
+        :type decoders: numpy.ndarray or None
+        """
+        self.solver = solver
+        self.weights = solver.weights
+        self.decoders = decoders
+        self.solved = None
+
+    def __call__(self, A, Y, rng=None, E=None):
+        shape = (A.shape[1], E.shape[1] if E is not None else Y.shape[1])
+        if self.decoders is not None and self.decoders.shape == shape:
+            self.solved = self.decoders
+            return self.decoders, dict(rmses=np.zeros(shape[1]), cached=True)
+        self.solved, info = self.solver(A, Y, rng=rng, E=E)
+        return self.solved, info
+
+
+class BuildCache(object):
+    def __init__(self, directory):
+        """
+        Keeps the expensive results of building a network (solved decoders,
+        encoders, gains, biases and evaluation points) on disk, so the next
+        build of the same network with the same parameters skips solving for
+        decoders.
+
+        Only seeded networks can be cached: without a seed every build
+        generates different neurons. Entries are keyed on the parameters of
+        the network, the shape of the network and the version of Nengo, so a
+        change to any of them results in a new entry.
+
+        :param directory: Where to keep the cache files. Created if needed.
+        :type directory: str
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Network -> key it was attached with
+        self.attached = dict()
+
+    def key(self, network, **parameters):
+        """
+        :param network: The network to cache
+        :type network: nengo.Network
+        :param parameters: The parameters the network was created with
+        :type parameters: dict
+        :return: The key of the cache entry of the network
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((CACHE_VERSION, nengo.__version__, network.seed,
+                            sorted(parameters.items()))))
+        for ensemble in network.all_ensembles:
+            digest.update(repr((ensemble.n_neurons, ensemble.dimensions,
+                                type(ensemble.neuron_type).__name__)))
+        for connection in network.all_connections:
+            digest.update(repr((connection.size_in, connection.size_out,
+                                type(connection.pre_obj).__name__,
+                                type(connection.post_obj).__name__)))
+        return digest.hexdigest()
+
+    def path(self, key):
+        """
+        :param key: The key of a cache entry
+        :type key: str
+        :return: The file holding the entry
+        :rtype: str
+        """
+        return os.path.join(self.directory, key + ".npz")
+
+    def attach(self, network, **parameters):
+        """
+        Prepare a network to be built from the cache. Cached ensemble
+        parameters are assigned to the ensembles and every decoded connection
+        gets a :py:class:`CachedSolver`. Must be called before the simulator
+        is built.
+
+        :param network: The network to cache
+        :type network: nengo.Network
+        :param parameters: The parameters the network was created with
+        :type parameters: dict
+        :return: Whether the network was found in the cache
+        :rtype: bool
+        :raises: ValueError if the network has no seed
+        """
+        if network.seed is None:
+            raise ValueError("Only seeded networks can be cached")
+        key = self.attached[network] = self.key(network, **parameters)
+        path = self.path(key)
+        data = dict()
+        if os.path.isfile(path):
+            with np.load(path) as entry:
+                data = dict(entry.items())
+
+        for index, ensemble in enumerate(network.all_ensembles):
+            if ("gain_%d" % index) not in data:
+                continue
+            ensemble.encoders = data["encoders_%d" % index]
+            ensemble.gain = data["gain_%d" % index]
+            ensemble.bias = data["bias_%d" % index]
+            ensemble.eval_points = data["eval_points_%d" % index]
+
+        for index, connection in enumerate(network.all_connections):
+            if isinstance(connection.solver, CachedSolver):
+                connection.solver.decoders = data.get("decoders_%d" % index)
+            elif connection.solver is not None:
+                connection.solver = CachedSolver(
+                    connection.solver, data.get("decoders_%d" % index))
+
+        logger.log(logging.DEBUG, "Build cache %s for %s" % (
+            "hit" if data else "miss", path))
+        return bool(data)
+
+    def save(self, network, model, **parameters):
+        """
+        Store the results of building a network that was prepared with
+        :py:meth:`attach`. Nothing is written if the network changed after
+        it was attached, as the direct backend does when it switches
+        ensembles to direct mode, since the entry would never be found again,
+        or if the build solved nothing worth keeping.
+
+        :param network: The network that was built
+        :type network: nengo.Network
+        :param model: The model built by the simulator (``simulator.model``)
+        :type model: nengo.builder.Model
+        :param parameters: The parameters the network was created with
+        :type parameters: dict
+        :return: Whether an entry was written
+        :rtype: bool
+        """
+        key = self.key(network, **parameters)
+        if self.attached.get(network, key) != key:
+            logger.log(logging.DEBUG, "Not caching a network that changed "
+                                      "after it was attached")
+            return False
+
+        data = dict()
+        for index, ensemble in enumerate(network.all_ensembles):
+            built = model.params.get(ensemble)
+            gain = getattr(built, 'gain', None)
+            if gain is None:
+                # Direct mode ensembles have no neurons
+                continue
+            data["encoders_%d" % index] = built.encoders
+            data["gain_%d" % index] = gain
+            data["bias_%d" % index] = built.bias
+            data["eval_points_%d" % index] = built.eval_points
+
+        for index, connection in enumerate(network.all_connections):
+            solved = getattr(connection.solver, 'solved', None)
+            if solved is not None:
+                data["decoders_%d" % index] = solved
+
+        path = self.path(key)
+        if not data:
+            logger.log(logging.DEBUG, "Nothing to cache for %s" % path)
+            return False
+
+        # Write to a temporary file first so a crash never leaves a partial
+        # entry behind
+        handle, temporary = tempfile.mkstemp(suffix=".npz",
+                                             dir=self.directory)
+        with os.fdopen(handle, "wb") as cache_file:
+            np.savez(cache_file, **data)
+        os.rename(temporary, path)
+        return True
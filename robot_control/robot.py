@@ -1,5 +1,6 @@
 from nengo.dists import Uniform
-from robot_utils.dot_product import DotProduct
+from robot_utils.dot_product import BatchedDotProduct
+from robot_utils.seeding import derive_seed
 
 __author__ = 'Petrut Bogdan'
 
@@ -8,40 +9,108 @@ import numpy as np
 from robot_interface.container import Container
 from robot_models.servo import Servo
 from robot_models.control_signal import ControlSignal
+from robot_models.stream_probe import StreamProbe
+import os
 from nengo.processes import WhiteNoise
 
 LEFT = np.array([0.7, 0.7])
 RIGHT = np.array([0.7, -0.7])
 
+# Initial values of the control signals for the first joints of an arm
+SILENCE_POSITION = np.array([.3, .7, 1])
+ZERO_POSITION = np.array([-.7, -.5, -.6])
+
+
+def arm_names(n_arms):
+    """
+    :param n_arms: The number of arms of the robot
+    :type n_arms: int
+    :return: The name of each arm: left and right for 2 arms, arm0, arm1,
+        ... otherwise
+    :rtype: list
+    """
+    if n_arms == 2:
+        return ["left", "right"]
+    return ["arm" + str(arm) for arm in range(n_arms)]
+
+
+def arm_directions(n_arms):
+    """
+    :param n_arms: The number of arms of the robot
+    :type n_arms: int
+    :return: The direction associated with each arm, matched against the
+        direction control signal to select an arm. LEFT and RIGHT for 2 arms,
+        otherwise unit vectors spread between them.
+    :rtype: numpy.ndarray
+    """
+    if n_arms == 2:
+        return np.array([LEFT, RIGHT])
+    angles = np.linspace(np.pi / 4, -np.pi / 4, n_arms) if n_arms > 1 else \
+        np.zeros(1)
+    return np.array([np.cos(angles), np.sin(angles)]).T
+
 
 class Robot(nengo.Network):
     def __init__(self, motor_gain=2.0, label=None, seed=None,
-                 add_to_container=None):
+                 add_to_container=None, joints_per_arm=3, n_arms=2,
+                 n_neurons=100, tau=0.1, feedback_tau=None):
         """
 
+        :param motor_gain: Gain applied to the error to drive the motors
+        :type motor_gain: float
         :param label: Name of the model. Defaults to None.
         :type label: str
         :param seed: Random number seed that will be fed to the random
             number generator. Setting this seed makes the creation of the
-            model a deterministic process; however, each new ensemble
-            in the network advances the random number generator, so if
-            the network creation code changes, the entire model changes.
+            model a deterministic process. Every ensemble and sub-network
+            of the robot gets a seed derived from this one and its name (see
+            :py:func:`~robot_utils.seeding.derive_seed`), so robots built
+            with the same seed and parameters have the same decoders.
         :type seed: int
         :param add_to_container: Determines if this Network will be added to
             the current container. Defaults to true iff currently with a Network
         :type add_to_container: bool
+        :param joints_per_arm: The number of joints (degrees of freedom) of
+            each arm
+        :type joints_per_arm: int
+        :param n_arms: The number of arms
+        :type n_arms: int
+        :param n_neurons: The number of neurons per represented dimension. The
+            error ensembles, which compute a non-linear function, use 5 times
+            as many.
+        :type n_neurons: int
+        :param tau: Post synaptic time constant of the connections
+        :type tau: float
+        :param feedback_tau: Post synaptic time constant of the recurrent
+            connections holding the current position of the arms. Defaults to
+            2 * tau.
+        :type feedback_tau: float
         """
         super(Robot, self).__init__(label, seed, add_to_container)
-        n_neurons = 100
-        tau = 0.1
+        self.joints_per_arm = joints_per_arm
+        self.n_arms = n_arms
+        self.n_neurons = n_neurons
+        self.tau = tau
+        self.feedback_tau = 2 * tau if feedback_tau is None else feedback_tau
         self.motor_gain = motor_gain
+        self.streams = []
+        joints = joints_per_arm
+        names = arm_names(n_arms)
 
         def error(vector):
             return np.sign(vector[0] - vector[1]) * ((vector[0] - vector[1]) ** 2)
 
-        self.servos = Container()
+        # Only the newest position of each servo group is worth transmitting
+        self.servos = Container(coalesce=True)
         self.controls = Container()
 
+        # Ensemble arrays and nodes of every arm, in the order of arm_names
+        self.current_positions = []
+        self.target_positions = []
+        self.errors = []
+        self.motors = []
+        self.servo_groups = []
+
         # white_noise_process = WhiteNoise(Uniform(-1., 1.), scale=True)
         # white_noise_process.default_size_out = 6
         with self:
@@ -49,87 +118,76 @@ class Robot(nengo.Network):
             self.action = ControlSignal(container=self.controls, size_out=3, label='action')
             self.direction = ControlSignal(container=self.controls, size_out=2, label='direction')
             self.sound = nengo.Node(lambda t: np.sin(1/1.6*t) - np.cos(2*t))
-            self.silence = ControlSignal(container=self.controls, size_out=3, label='silence')
-            self.silence_ens = nengo.Ensemble(3 * n_neurons, 3)
+            self.silence = ControlSignal(container=self.controls, size_out=joints, label='silence')
+            self.silence_ens = nengo.Ensemble(joints * n_neurons, joints, seed=derive_seed(seed, 'silence'))
             nengo.Connection(self.silence, self.silence_ens, synapse=tau)
 
-            self.zero = ControlSignal(container=self.controls, size_out=3, label="zero")
-            self.zero_ens = nengo.Ensemble(3 * n_neurons, 3)
+            self.zero = ControlSignal(container=self.controls, size_out=joints, label="zero")
+            self.zero_ens = nengo.Ensemble(joints * n_neurons, joints, seed=derive_seed(seed, 'zero'))
             nengo.Connection(self.zero, self.zero_ens, synapse=tau)
 
             # Initialisation
             self.controls.update(self.action, np.asarray([1., 0., 0.]))
             self.controls.update(self.direction, np.asarray([1., 0.]))
-            self.controls.update(self.silence, np.asarray([.3, .7, 1]))
-            self.controls.update(self.zero, np.asarray([-.7, -.5, -.6]))
-
-            # Hidden layer
-            self.left_current_position = nengo.networks.EnsembleArray(n_neurons, 3)
-            self.right_current_position = nengo.networks.EnsembleArray(n_neurons, 3)
-
-            self.left_target_position = nengo.networks.EnsembleArray(n_neurons, 3)
-            self.right_target_position = nengo.networks.EnsembleArray(n_neurons, 3)
-
-            self.left_error = nengo.networks.EnsembleArray(5 * n_neurons, n_ensembles=3, ens_dimensions=2, radius=1.3)
-            self.right_error = nengo.networks.EnsembleArray(5 * n_neurons, n_ensembles=3, ens_dimensions=2, radius=1.3)
-
-            nengo.Connection(self.left_target_position.output, self.left_error.input[[0, 2, 4]])
-            nengo.Connection(self.left_current_position.output, self.left_error.input[[1, 3, 5]])
-
-            nengo.Connection(self.right_target_position.output, self.right_error.input[[0, 2, 4]])
-            nengo.Connection(self.right_current_position.output, self.right_error.input[[1, 3, 5]])
-
-            nengo.Connection(self.silence_ens, self.left_target_position.input)
-            nengo.Connection(self.silence_ens, self.right_target_position.input)
-
-            nengo.Connection(self.zero_ens, self.left_error.input[[0, 2, 4]], transform=np.eye(3))
-            nengo.Connection(self.zero_ens, self.right_error.input[[0, 2, 4]], transform=np.eye(3))
-
-            # Feedback
-            left_error = self.left_error.add_output("error", error)
-            right_error = self.right_error.add_output("error", error)
-
-            nengo.Connection(left_error, self.left_current_position.input, synapse=tau)
-            nengo.Connection(right_error, self.right_current_position.input, synapse=tau)
-
-            nengo.Connection(self.left_current_position.output, self.left_current_position.input, synapse=2 * tau)
-            nengo.Connection(self.right_current_position.output, self.right_current_position.input, synapse=2 * tau)
-
-            # Output
-            self.left_motors = nengo.Node(size_in=3)
-            self.right_motors = nengo.Node(size_in=3)
-
-            nengo.Connection(left_error, self.left_motors, synapse=tau, transform=np.eye(3) * self.motor_gain)
-            nengo.Connection(right_error, self.right_motors, synapse=tau, transform=np.eye(3) * self.motor_gain)
-
-            self.left_servos = Servo(container=self.servos, size_in=3, label="left_servos")
-            self.right_servos = Servo(container=self.servos, size_in=3, label="right_servos")
-
-            nengo.Connection(self.left_current_position.output, self.left_servos, synapse=tau)
-            nengo.Connection(self.right_current_position.output, self.right_servos, synapse=tau)
+            self.controls.update(self.silence, np.resize(SILENCE_POSITION, joints))
+            self.controls.update(self.zero, np.resize(ZERO_POSITION, joints))
 
             # Action selection
             # The 2 actions are: silence and gesture
             # Gesture inhibits a target function (goes idle)
             # Silence inhibits sound and give a target position of its own
-            self.bg = nengo.networks.BasalGanglia(3, output_weight=-3)
+            self.bg = nengo.networks.BasalGanglia(3, output_weight=-3, net=nengo.Network(seed=derive_seed(seed, 'bg')))
             nengo.Connection(self.action, self.bg.input)
 
-            self.action_thalamus = nengo.networks.Thalamus(3)
+            self.action_thalamus = nengo.networks.Thalamus(3, net=nengo.Network(seed=derive_seed(seed, 'action_thalamus')))
             nengo.Connection(self.bg.output, self.action_thalamus.input, synapse=tau)
 
             # Sound connections
-            self.rhythm = nengo.Ensemble(n_neurons, 1)
+            self.rhythm = nengo.Ensemble(n_neurons, 1, seed=derive_seed(seed, 'rhythm'))
             nengo.Connection(self.sound, self.rhythm, transform=[.9])
 
-            nengo.Connection(self.rhythm, self.left_target_position.input[[0]], transform=[[-1]], synapse=tau)
-            nengo.Connection(self.rhythm, self.right_target_position.input[[0]], transform=[[1.]], synapse=tau)
-
-            nengo.Connection(self.rhythm, self.left_target_position.input[[1]], transform=[[1.]], synapse=tau)
-            nengo.Connection(self.rhythm, self.right_target_position.input[[1]], transform=[[-1.]], synapse=tau)
-
-            nengo.Connection(self.rhythm, self.left_target_position.input[[2]], transform=[[-1.]], synapse=tau)
-            nengo.Connection(self.rhythm, self.right_target_position.input[[2]], transform=[[1.]], synapse=tau)
+            for arm, name in enumerate(names):
+                # Hidden layer
+                current_position = nengo.networks.EnsembleArray(n_neurons, joints, seed=derive_seed(seed, name, 'current_position'))
+                target_position = nengo.networks.EnsembleArray(n_neurons, joints, seed=derive_seed(seed, name, 'target_position'))
+                arm_error = nengo.networks.EnsembleArray(5 * n_neurons, n_ensembles=joints, ens_dimensions=2, radius=1.3, seed=derive_seed(seed, name, 'error'))
+                targets = range(0, 2 * joints, 2)
+                currents = range(1, 2 * joints, 2)
+
+                nengo.Connection(target_position.output, arm_error.input[targets])
+                nengo.Connection(current_position.output, arm_error.input[currents])
+
+                nengo.Connection(self.silence_ens, target_position.input)
+                nengo.Connection(self.zero_ens, arm_error.input[targets], transform=np.eye(joints))
+
+                # Feedback
+                error_output = arm_error.add_output("error", error)
+                nengo.Connection(error_output, current_position.input, synapse=tau)
+                nengo.Connection(current_position.output, current_position.input, synapse=self.feedback_tau)
+
+                # Output
+                motors = nengo.Node(size_in=joints)
+                nengo.Connection(error_output, motors, synapse=tau, transform=np.eye(joints) * self.motor_gain)
+
+                servos = Servo(container=self.servos, size_in=joints, label=name + "_servos")
+                nengo.Connection(current_position.output, servos, synapse=tau)
+
+                # The rhythm moves neighbouring joints, and the same joint of
+                # neighbouring arms, in opposite directions
+                for joint in range(joints):
+                    nengo.Connection(self.rhythm, target_position.input[[joint]],
+                                     transform=[[(-1.) ** (joint + arm + 1)]], synapse=tau)
+
+                self.current_positions.append(current_position)
+                self.target_positions.append(target_position)
+                self.errors.append(arm_error)
+                self.motors.append(motors)
+                self.servo_groups.append(servos)
+                setattr(self, name + "_current_position", current_position)
+                setattr(self, name + "_target_position", target_position)
+                setattr(self, name + "_error", arm_error)
+                setattr(self, name + "_motors", motors)
+                setattr(self, name + "_servos", servos)
 
             # If silencing, inhibit rhythm
             nengo.Connection(self.action_thalamus.output[1], self.rhythm.neurons, transform=[[-2.]] * self.rhythm.n_neurons, synapse=tau)
@@ -147,34 +205,132 @@ class Robot(nengo.Network):
 
             # Select an arm for silencing / gesturing
 
-            self.left_dp = DotProduct()
-            self.right_dp = DotProduct()
-
-            self.left = nengo.Node(output=LEFT)
-            self.right = nengo.Node(output=RIGHT)
-
-            nengo.Connection(self.direction, self.left_dp.in_A)
-            nengo.Connection(self.left, self.left_dp.in_B)
-
-            nengo.Connection(self.direction, self.right_dp.in_A)
-            nengo.Connection(self.right, self.right_dp.in_B)
+            self.arm_selector = nengo.networks.BasalGanglia(n_arms, net=nengo.Network(seed=derive_seed(seed, 'arm_selector')))
+            # How closely the direction matches each arm. The arm directions
+            # are constant, so they are folded into the transform of the
+            # adders, which then hold the scalar results
+            self.arm_dp = BatchedDotProduct(n_neurons, vectors=arm_directions(n_arms), seed=derive_seed(seed, 'arm_dp'))
+            nengo.Connection(self.direction, self.arm_dp.in_A)
+            match = self.arm_dp.adder.add_output("match", lambda x: np.abs(x))
+            nengo.Connection(match, self.arm_selector.input)
 
-            L = nengo.Ensemble(100, 1)
-            R = nengo.Ensemble(100, 1)
-            nengo.Connection(self.left_dp.output, L)
-            nengo.Connection(self.right_dp.output, R)
-
-            self.arm_selector = nengo.networks.BasalGanglia(2)
+            # Basal ganglia will now inhibit the opposing arm
+            for arm, target_position in enumerate(self.target_positions):
+                for other in range(n_arms):
+                    if other == arm:
+                        continue
+                    for ensemble in target_position.all_ensembles:
+                        nengo.Connection(self.arm_selector.output[other], ensemble.neurons, transform=[[1]] * ensemble.n_neurons)
+
+    @property
+    def parameters(self):
+        """
+        The parameters the robot was created with, besides the seed
 
-            nengo.Connection(L, self.arm_selector.input[0], function=lambda x: np.abs(x))
-            nengo.Connection(R, self.arm_selector.input[1], function=lambda x: np.abs(x))
+        :rtype: dict
+        """
+        return dict(motor_gain=self.motor_gain,
+                    joints_per_arm=self.joints_per_arm, n_arms=self.n_arms,
+                    n_neurons=self.n_neurons, tau=self.tau,
+                    feedback_tau=self.feedback_tau)
 
-            # Basal ganglia will now inhibit the opposing arm
-            for ensemble in self.left_target_position.all_ensembles:
-                nengo.Connection(self.arm_selector.output[1], ensemble.neurons, transform=[[1]] * ensemble.n_neurons)
+    def budget(self):
+        """
+        Size of the network, to compare configurations. Decoders counts the
+        decoding weights of the connections leaving ensembles and
+        neuron_weights the weights of the connections made directly to
+        neurons (e.g. inhibition).
+
+        :return: The number of ensembles, neurons, represented dimensions,
+            connections, decoders and neuron weights
+        :rtype: dict
+        """
+        report = dict(ensembles=0, neurons=0, dimensions=0, connections=0,
+                      decoders=0, neuron_weights=0)
+        for ensemble in self.all_ensembles:
+            report['ensembles'] += 1
+            report['neurons'] += ensemble.n_neurons
+            report['dimensions'] += ensemble.dimensions
+        for connection in self.all_connections:
+            report['connections'] += 1
+            if isinstance(connection.pre_obj, nengo.Ensemble):
+                report['decoders'] += (connection.pre_obj.n_neurons *
+                                       connection.size_mid)
+            if isinstance(connection.post_obj, nengo.ensemble.Neurons):
+                report['neuron_weights'] += (connection.size_mid *
+                                             connection.post_obj.size_in)
+        return report
+
+    def stream(self, directory, signals=None, decimation=10, chunk_size=1000,
+               synapse=0.01, segment_size=1 << 26):
+        """
+        Record signals of the robot to disk for the whole simulation, using a
+        fixed amount of memory. Each signal is written by a
+        :py:class:`~robot_models.stream_probe.StreamProbe` into its own
+        sub-directory and can be read back with
+        :py:func:`~robot_models.stream_probe.load_stream`. Must be called
+        before the simulator is built.
+
+        :param directory: Where to write the recordings
+        :type directory: str
+        :param signals: The objects to record, by name. A value can also be an
+            ``(object, synapse)`` tuple. Defaults to the errors, positions
+            and servo outputs of every arm and the selected action.
+        :type signals: dict
+        :param decimation: The number of ticks between two samples
+        :type decimation: int
+        :param chunk_size: The number of samples written at once
+        :type chunk_size: int
+        :param synapse: The synapse used to filter the signals
+        :type synapse: float
+        :param segment_size: The size of a segment file in bytes
+        :type segment_size: int
+        :return: The stream probes, by name
+        :rtype: dict
+        """
+        if signals is None:
+            signals = {'action_thalamus': self.action_thalamus.output}
+            for name, current_position, arm_error in zip(
+                    arm_names(self.n_arms), self.current_positions,
+                    self.errors):
+                signals[name + '_error'] = arm_error.error
+                signals[name + '_current_position'] = current_position.output
+                # Filtered in the same way as the inputs of the servos
+                signals[name + '_servos'] = (current_position.output,
+                                             self.tau)
+        probes = dict()
+        with self:
+            for name, signal in signals.iteritems():
+                obj, signal_synapse = signal if isinstance(
+                    signal, tuple) else (signal, synapse)
+                probe = StreamProbe(os.path.join(directory, name),
+                                    size_in=obj.size_out, label=name,
+                                    decimation=decimation,
+                                    chunk_size=chunk_size,
+                                    segment_size=segment_size)
+                nengo.Connection(obj, probe, synapse=signal_synapse)
+                probes[name] = probe
+        self.streams.extend(probes.values())
+        return probes
+
+    def flush_streams(self):
+        """Write the samples that the stream probes are still holding in
+        memory."""
+        for probe in self.streams:
+            probe.flush()
+
+    def set_dt(self, dt):
+        """
+        Tell the I/O nodes of the robot the time step of the simulator that
+        runs it, so their sampling periods are counted in real ticks.
 
-            for ensemble in self.right_target_position.all_ensembles:
-                nengo.Connection(self.arm_selector.output[0], ensemble.neurons, transform=[[1]] * ensemble.n_neurons)
+        :param dt: The time step in seconds
+        :type dt: float
+        """
+        for node in self.all_nodes:
+            rate = getattr(node, 'rate', None)
+            if rate is not None:
+                rate.set_dt(dt)
 
 if __name__ == "__main__":
     r = Robot()
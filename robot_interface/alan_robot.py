@@ -1,13 +1,28 @@
 __author__ = 'Petrut Bogdan'
 
 from robot_control.robot import Robot
+from robot_control.build_cache import BuildCache
 from simulation_control import SimulationControl
-import nengo_spinnaker
+import backends
+import functools
+import logging
 import numpy as np
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Nengo 2.1 cannot build several networks from different threads at once, so
+# the robots launched in parallel take turns to create theirs. Building the
+# simulator, where most of the time goes, still runs in parallel.
+_network_lock = threading.Lock()
 
 
 class AlanRobot(object):
-    def __init__(self, run_time=None, period=None, **simulation_parameters):
+    def __init__(self, run_time=None, period=None, simulator_factory=None,
+                 backend=backends.SPINNAKER, realtime=True,
+                 stream_directory=None, build_cache=None, seed=None,
+                 **simulation_parameters):
         """
         This object is an interface for controlling the Robot simulation.
 
@@ -17,16 +32,73 @@ class AlanRobot(object):
             how much memory will be allocated to store
             precomputed and probed data.
         :type period: float or None
+        :param simulator_factory: Callable that builds the simulator for the
+            network, called with the network and the simulation parameters.
+            Leave as None to use the backend.
+        :type simulator_factory: callable
+        :param backend: The simulator to use when no factory is given:
+            SpiNNaker (``"spinnaker"``), the reference CPU simulator
+            (``"nengo"``) or the reference simulator with ensembles in direct
+            mode (``"direct"``). See :py:mod:`.backends`.
+        :type backend: str
+        :param realtime: Whether to pace simulators that run on the host
+            against the wall clock, so the servos move in real time. See
+            :py:class:`.SimulationControl`.
+        :type realtime: bool
+        :param stream_directory: Where to record the main signals of the
+            robot during the simulation. Leave as None to record nothing. See
+            :py:meth:`.Robot.stream`.
+        :type stream_directory: str
+        :param build_cache: Directory of a
+            :py:class:`~robot_control.build_cache.BuildCache` used to skip
+            solving for decoders when a robot with the same parameters was
+            built before. Only used if the robot is seeded.
+        :type build_cache: str
+        :param seed: Seed of the Robot network, from which the seeds of all
+            its ensembles are derived. Robots with the same seed build the
+            same decoders. Leave as None for a different robot every time.
+        :type seed: int
         :param simulation_parameters: Parameters of the Robot Network. See
             :class:`.Robot` for a list of the parameters and what
             they each represent.
         :type simulation_parameters: dict
         """
-        self.robot = Robot()
-
-        self.simulation_control = SimulationControl(
-            nengo_spinnaker.Simulator(self.robot, period=period,
-                                      **simulation_parameters), run_time)
+        # Seconds spent in each phase of the construction
+        self.timings = dict()
+
+        with _network_lock:
+            start = time.time()
+            self.robot = Robot(seed=seed)
+            if stream_directory is not None:
+                self.robot.stream(stream_directory)
+            self.timings['network'] = time.time() - start
+
+            cache, cached = None, False
+            if build_cache is not None:
+                if self.robot.seed is None:
+                    logger.warning("Not using the build cache: the robot has "
+                                   "no seed")
+                else:
+                    cache = BuildCache(build_cache)
+                    cached = cache.attach(self.robot, **self.robot.parameters)
+
+        start = time.time()
+        if simulator_factory is None:
+            simulator_factory = functools.partial(
+                backends.simulator_factory(backend), period=period)
+        simulator = simulator_factory(self.robot, **simulation_parameters)
+        self.timings['simulator'] = time.time() - start
+        if cache is not None and not cached and hasattr(simulator, 'model'):
+            cache.save(self.robot, simulator.model, **self.robot.parameters)
+
+        self.robot.set_dt(getattr(simulator, 'dt', 0.001))
+        self.simulation_control = SimulationControl(simulator, run_time,
+                                                    realtime=realtime)
+
+        # Control signals driven by the behaviours
+        self.action = self.controls.key_with_label("action")
+        self.direction = self.controls.key_with_label("direction")
+        self.silence_control = self.controls.key_with_label("silence")
 
     def start_simulation(self):
         """
@@ -39,6 +111,9 @@ class AlanRobot(object):
         Stop the simulation. This will be the last action.
         """
         self.simulation_control.stop()
+        if self.simulation_control.is_alive():
+            self.simulation_control.join()
+        self.robot.flush_streams()
 
     def enable_robot(self):
         """
@@ -105,14 +180,11 @@ class AlanRobot(object):
 
     @staticmethod
     def labels(container):
-        for k in container.dictionary.keys():
-            yield k.label
+        return container.labels.keys()
 
     @staticmethod
     def key_with_label_in_container(label, container):
-        for k in container.dictionary.keys():
-            if k.label == label:
-                return k
+        return container.key_with_label(label)
 
     def silence(self, position=np.asarray([.4, .8, 1])):
         """
@@ -122,23 +194,16 @@ class AlanRobot(object):
         :return:
         :rtype:
         """
-        # retrieve control signal responsible for position
-        silence = AlanRobot.key_with_label_in_container("silence",
-                                                        self.controls)
-        self.controls.update(silence, position)
+        with self.controls.batch():
+            # control signal responsible for position
+            self.controls.update(self.silence_control, position)
 
-        # retrieve control signal responsible for direction
-        direction = AlanRobot.key_with_label_in_container("direction",
-                                                          self.controls)
+            # choose a random direction (either left or right)
+            self.controls.update(self.direction, np.asarray(
+                [.7, .7]) if np.random.rand() > .5 else np.asarray([-.7, .7]))
 
-        # choose a random direction (either left or right)
-        self.controls.update(direction, np.asarray(
-            [.7, .7]) if np.random.rand() > .5 else np.asarray([-.7, .7]))
-
-        # retrieve control signal responsible for action selection
-        action = AlanRobot.key_with_label_in_container("action",
-                                                       self.controls)
-        self.controls.update(action, np.asarray([0., 1., 0.]))
+            # control signal responsible for action selection
+            self.controls.update(self.action, np.asarray([0., 1., 0.]))
 
     def gesture(self):
         """
@@ -146,25 +211,18 @@ class AlanRobot(object):
         :return:
         :rtype:
         """
-        # retrieve control signal responsible for direction
-        direction = AlanRobot.key_with_label_in_container("direction",
-                                                          self.controls)
-
         # choose a random direction (left, right or both)
         possible_direction = [np.asarray([1., 0.]), np.asarray([.7, .7]), np.asarray([-.7, .7])]
-        self.controls.update(direction, possible_direction[np.random.randint(0, len(possible_direction))])
+        with self.controls.batch():
+            self.controls.update(self.direction, possible_direction[np.random.randint(0, len(possible_direction))])
 
-        # retrieve control signal responsible for action selection
-        action = AlanRobot.key_with_label_in_container("action",
-                                                       self.controls)
-        self.controls.update(action, np.asarray([1., 0., 0.]))
+            # control signal responsible for action selection
+            self.controls.update(self.action, np.asarray([1., 0., 0.]))
 
     def idle(self):
         """
         Method that causes the robot to idle
         :return:
         """
-         # retrieve control signal responsible for action selection
-        action = AlanRobot.key_with_label_in_container("action",
-                                                       self.controls)
-        self.controls.update(action, np.asarray([0., 0., 1.]))
\ No newline at end of file
+        # control signal responsible for action selection
+        self.controls.update(self.action, np.asarray([0., 0., 1.]))
\ No newline at end of file
@@ -0,0 +1,99 @@
+__author__ = 'Petrut Bogdan'
+
+import nengo
+from nengo.ensemble import Neurons
+
+# Simulator backends
+SPINNAKER = "spinnaker"
+REFERENCE = "nengo"
+DIRECT = "direct"
+
+
+def spinnaker_simulator(network, period=None, **simulation_parameters):
+    """
+    Build the network on a SpiNNaker board.
+
+    :param network: The network to simulate
+    :type network: nengo.Network
+    :param period: Duration of one period of the simulator
+    :type period: float or None
+    :param simulation_parameters: Parameters of
+        :py:class:`nengo_spinnaker.Simulator` (e.g. hostname, width, height)
+    :rtype: nengo_spinnaker.Simulator
+    """
+    import nengo_spinnaker
+    return nengo_spinnaker.Simulator(network, period=period,
+                                     **simulation_parameters)
+
+
+def reference_simulator(network, period=None, dt=0.001, seed=None):
+    """
+    Build the network for the reference CPU simulator. The period is
+    ignored: the reference simulator allocates its memory as it runs.
+
+    :param network: The network to simulate
+    :type network: nengo.Network
+    :param dt: The time step in seconds
+    :type dt: float
+    :param seed: Seed of the simulator's random number generator
+    :type seed: int
+    :rtype: nengo.Simulator
+    """
+    return nengo.Simulator(network, dt=dt, seed=seed)
+
+
+def direct_simulator(network, period=None, dt=0.001, seed=None):
+    """
+    Build the network for the reference CPU simulator with ensembles
+    computing their functions exactly. See :py:func:`set_direct_mode`.
+
+    :rtype: nengo.Simulator
+    """
+    set_direct_mode(network)
+    return reference_simulator(network, period, dt, seed)
+
+
+def set_direct_mode(network):
+    """
+    Make the ensembles of a network compute their functions exactly instead
+    of with spiking neurons. Ensembles that have connections to or from
+    their neurons (e.g. inhibition) need neurons and keep them.
+
+    :param network: The network to modify
+    :type network: nengo.Network
+    :return: The number of ensembles switched to direct mode
+    :rtype: int
+    """
+    with_neurons = set()
+    for connection in network.all_connections:
+        for obj in (connection.pre_obj, connection.post_obj):
+            if isinstance(obj, Neurons):
+                with_neurons.add(obj.ensemble)
+
+    switched = 0
+    for ensemble in network.all_ensembles:
+        if ensemble not in with_neurons:
+            ensemble.neuron_type = nengo.Direct()
+            switched += 1
+    return switched
+
+
+BACKENDS = {
+    SPINNAKER: spinnaker_simulator,
+    REFERENCE: reference_simulator,
+    DIRECT: direct_simulator,
+}
+
+
+def simulator_factory(backend):
+    """
+    :param backend: One of ``SPINNAKER``, ``REFERENCE`` or ``DIRECT``
+    :type backend: str
+    :return: The function that builds a simulator for the backend
+    :rtype: callable
+    :raises: ValueError if the backend is unknown
+    """
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError("Unknown simulator backend " + repr(backend))
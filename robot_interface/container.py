@@ -1,25 +1,319 @@
 __author__ = 'Petrut Bogdan'
+import collections
+import contextlib
+import logging
 import threading
-import thread
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Overflow policies for the callback dispatch queues
+DROP_OLDEST = "drop-oldest"
+COALESCE = "coalesce"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE, BLOCK)
+
+
+class DispatchQueue(object):
+    def __init__(self, max_size=64, overflow=DROP_OLDEST):
+        """
+        A bounded FIFO of pending callbacks. Entries are ``[key, value,
+        callback]`` lists and are consumed in the order they were posted.
+
+        :param max_size: The maximum number of pending callbacks
+        :type max_size: int > 0
+        :param overflow: What to do when a callback is posted to a full queue:
+            drop the oldest pending callback (``DROP_OLDEST``), replace the
+            value of a pending callback for the same key (``COALESCE``, falls
+            back to dropping the oldest) or wait for space (``BLOCK``)
+        :type overflow: str
+        """
+        if max_size < 1:
+            raise ValueError("Queue size must be at least 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy " + repr(overflow))
+        self.max_size = max_size
+        self.overflow = overflow
+        self.condition = threading.Condition()
+        self.entries = collections.deque()
+        # The most recent pending entry of every key
+        self.pending = dict()
+        self.closed = False
+
+        self.queued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.dispatched = 0
+
+    def put(self, key, value, callback, coalesce=False):
+        """
+        Post a callback to the queue, applying the overflow policy if the
+        queue is full.
+
+        :param coalesce: If a callback for the key is already pending, replace
+            its value instead of queueing a new callback
+        :type coalesce: bool
+        :return: False if the queue has been closed, in which case the
+            callback is counted as dropped, True otherwise
+        :rtype: bool
+        """
+        with self.condition:
+            posted = self._put(key, value, callback, coalesce)
+            self.condition.notify_all()
+            return posted
+
+    def put_many(self, entries):
+        """
+        Post several callbacks, waking up the consumer once.
+
+        :param entries: ``(key, value, callback, coalesce)`` tuples. See
+            :py:meth:`put`.
+        :type entries: list
+        :return: False if the queue has been closed, True otherwise
+        :rtype: bool
+        """
+        with self.condition:
+            posted = all([self._put(*entry) for entry in entries])
+            self.condition.notify_all()
+            return posted
+
+    def _put(self, key, value, callback, coalesce):
+        if self.closed:
+            self.dropped += 1
+            return False
+        if coalesce and self._replace(key, value, callback):
+            return True
+        if len(self.entries) >= self.max_size:
+            if self.overflow == BLOCK:
+                # Entries posted by put_many may not have been announced yet
+                self.condition.notify_all()
+                while (len(self.entries) >= self.max_size and
+                       not self.closed):
+                    self.condition.wait()
+                if self.closed:
+                    self.dropped += 1
+                    return False
+            elif (self.overflow == COALESCE and
+                  self._replace(key, value, callback)):
+                return True
+            else:
+                dropped = self.entries.popleft()
+                if self.pending.get(dropped[0]) is dropped:
+                    del self.pending[dropped[0]]
+                self.dropped += 1
+        entry = [key, value, callback]
+        self.entries.append(entry)
+        self.pending[key] = entry
+        self.queued += 1
+        return True
+
+    def _replace(self, key, value, callback):
+        entry = self.pending.get(key)
+        if entry is None:
+            return False
+        entry[1] = value
+        entry[2] = callback
+        self.queued += 1
+        self.coalesced += 1
+        return True
+
+    def get(self):
+        """
+        Wait for the next pending callback.
+
+        :return: The oldest pending entry or None once the queue has been
+            closed and drained
+        :rtype: list or None
+        """
+        with self.condition:
+            while not self.entries and not self.closed:
+                self.condition.wait()
+            if not self.entries:
+                return None
+            entry = self.entries.popleft()
+            if self.pending.get(entry[0]) is entry:
+                del self.pending[entry[0]]
+            self.condition.notify_all()
+            return entry
+
+    def task_done(self):
+        """Record that a callback returned by :py:meth:`get` has run."""
+        with self.condition:
+            self.dispatched += 1
+
+    def close(self):
+        """Refuse new callbacks and wake up every waiting thread. Pending
+        callbacks can still be retrieved."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def clear(self):
+        """Drop the pending callbacks, counting them as dropped."""
+        with self.condition:
+            self.dropped += len(self.entries)
+            self.entries.clear()
+            self.pending.clear()
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ValueSlot(object):
+    def __init__(self, value):
+        """
+        Double-buffered value shared between writer threads and a reader that
+        runs every simulator tick.
+
+        A writer copies the new value into the back buffer and then publishes
+        it by swapping the buffers, so the reader always sees a complete
+        vector and never waits for a lock or allocates. ``sequence`` is odd
+        while a write is in progress and advances by 2 with every write.
+
+        :param value: The initial value
+        :type value: float or numpy.ndarray
+        """
+        value = np.array(value, dtype=np.float64)
+        self.buffers = (value, value.copy())
+        self.front = 0
+        self.sequence = 0
+        self.lock = threading.Lock()
+        # The value and sequence as of the last simulator tick. See
+        # Container.sample.
+        self.sample = value.copy()
+        self.sample_sequence = 0
+
+    def write(self, value):
+        """
+        Publish a new value. Writers are serialised; the reader is not
+        blocked.
+
+        :param value: The new value, with the shape of the initial value
+        :type value: float or numpy.ndarray
+        """
+        with self.lock:
+            self.stage(value)
+            self.publish()
+
+    def stage(self, value):
+        """
+        Copy a value into the back buffer without publishing it. The caller
+        must hold :py:attr:`lock` until :py:meth:`publish` is called.
+
+        :param value: The new value, with the shape of the initial value
+        :type value: float or numpy.ndarray
+        :raises: ValueError if the value does not fit, in which case nothing
+            is staged
+        """
+        value = self.prepare(value)
+        self.sequence += 1
+        self.buffers[1 - self.front][...] = value
+
+    def prepare(self, value):
+        """
+        Convert a value to the shape of the slot, so copying it cannot fail
+        halfway through a write.
+
+        :param value: The new value
+        :type value: float or numpy.ndarray
+        :return: The value, broadcast to the shape of the slot
+        :rtype: numpy.ndarray
+        :raises: ValueError if the value cannot take the shape of the slot
+        """
+        return np.broadcast_to(np.asarray(value, dtype=np.float64),
+                               self.buffers[self.front].shape)
+
+    def publish(self):
+        """Make the staged value the current one. The caller must hold
+        :py:attr:`lock`."""
+        self.front = 1 - self.front
+        self.sequence += 1
+
+    def read(self):
+        """
+        The current value, without copying it. The returned array is reused
+        by the write after next, so copy it if it has to be kept.
+
+        :rtype: numpy.ndarray
+        """
+        return self.buffers[self.front]
+
+    def read_into(self, out):
+        """
+        Copy the current value into ``out``, retrying if a write was
+        published while copying.
+
+        :param out: The array to copy into
+        :type out: numpy.ndarray
+        :return: out
+        :rtype: numpy.ndarray
+        """
+        while True:
+            sequence = self.sequence
+            if sequence % 2 == 0:
+                out[...] = self.buffers[self.front]
+                if sequence == self.sequence:
+                    return out
 
 
 class Container(object):
-    def __init__(self, default_callback=None):
+    def __init__(self, default_callback=None, workers=2, queue_size=64,
+                 overflow=DROP_OLDEST, coalesce=False):
         """
         Container is an object that keeps track of different keys and
         potentially triggers a callback when the value is changed.
 
+        Callbacks are run by a fixed pool of worker threads, started on the
+        first update that needs one. Every key is always served by the same
+        worker, so callbacks for a key run in the order of the updates.
+
         Can be run in a ContainerThread.
 
         :param default_callback: a default callback for all the elements in the
             container
         :type default_callback: callable
+        :param workers: The number of threads running callbacks
+        :type workers: int > 0
+        :param queue_size: The maximum number of pending callbacks per worker
+        :type queue_size: int > 0
+        :param overflow: The policy applied when a worker's queue is full. See
+            :py:class:`DispatchQueue`.
+        :type overflow: str
+        :param coalesce: Deliver only the newest value of every key: an update
+            to a key that already has a callback pending replaces the pending
+            value. Can also be enabled per key with
+            :py:meth:`set_coalescing`.
+        :type coalesce: bool
         """
         self.default_callback = default_callback
         if default_callback:
             assert callable(default_callback)
+        if workers < 1:
+            raise ValueError("A container needs at least 1 worker")
 
         self.dictionary = dict()
+        self.labels = dict()
+        self._slots = dict()
+        self._batch = threading.local()
+        # Odd while updates are being published to the slots, advances by 2
+        # with every update or batch
+        self.generation = 0
+        self._publish_lock = threading.Lock()
+        self._sample_time = None
+        self._sample_generation = None
+        self.coalesce = coalesce
+        self._coalesced_keys = set()
+
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._queues = [DispatchQueue(queue_size, overflow)
+                        for _ in range(workers)]
+        # Queues replaced by bind, kept for their counters
+        self._retired_queues = []
+        self._workers = []
+        self._workers_lock = threading.Lock()
 
     def add(self, key, value):
         """
@@ -29,9 +323,31 @@ class Container(object):
         :type key: class from :py:mod:`.robot_models`
         :param value: The value associated with the key
         :type value: float
+        :raises: ValueError if another key already has the same label
         """
+        self._index_label(key)
         self.dictionary[key] = value
 
+    def _index_label(self, key):
+        label = getattr(key, 'label', None)
+        if label is None:
+            return
+        existing = self.labels.get(label)
+        if existing is not None and existing is not key:
+            raise ValueError("Duplicate label " + repr(label))
+        self.labels[label] = key
+
+    def key_with_label(self, label):
+        """
+        Find a key by its label.
+
+        :param label: The label of the key
+        :type label: str
+        :return: The key with the label or None if there is no such key
+        :rtype: class from :py:mod:`.robot_models`
+        """
+        return self.labels.get(label)
+
     def update(self, key, value, callback=None):
         """
         This method should only be used to update inputs (i.e. sensors and
@@ -46,9 +362,248 @@ class Container(object):
         :type callback: callable
         """
         callback = callback if callback else self.default_callback
-        self.dictionary[key] = value
+        updates = getattr(self._batch, 'updates', None)
+        if updates is not None:
+            updates[key] = (value, callback)
+            return
+        self._write(key, value)
         if callback:
-            thread.start_new_thread(callback, (key, value))
+            self._dispatch(key, value, callback)
+
+    def update_many(self, keys, values, callback=None):
+        """
+        Update several keys at once. See :py:meth:`batch`.
+
+        :param keys: The keys to update
+        :type keys: list
+        :param values: The new value of every key, in the same order
+        :type values: list
+        :param callback: The method to be called for each updated value. Leave
+            as None to use default callback.
+        :type callback: callable
+        """
+        with self.batch():
+            for key, value in zip(keys, values):
+                self.update(key, value, callback)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager that groups the updates made by the current thread.
+        The values only become visible when the block exits, all of them
+        published within one :py:attr:`generation`, so nodes that read
+        through :py:meth:`sample` see all of them in the same tick or none.
+        The callbacks are then posted with a single wake-up of each worker.
+        If the block raises, the updates are discarded. Nested batches join
+        the outermost one.
+
+        Example::
+
+            with container.batch():
+                container.update(direction, np.asarray([.7, .7]))
+                container.update(action, np.asarray([0., 1., 0.]))
+        """
+        if getattr(self._batch, 'updates', None) is not None:
+            yield self
+            return
+        updates = self._batch.updates = collections.OrderedDict()
+        try:
+            yield self
+        finally:
+            self._batch.updates = None
+        self._commit(updates)
+
+    def _commit(self, updates):
+        # Values that do not fit their slot fail here, before anything is
+        # published
+        slots = [(self._slots[key], self._slots[key].prepare(value))
+                 for key, (value, callback) in updates.iteritems()
+                 if key in self._slots]
+        locks = sorted(set([slot.lock for slot, value in slots]), key=id)
+        with self._publish_lock:
+            self.generation += 1
+            for lock in locks:
+                lock.acquire()
+            try:
+                for slot, value in slots:
+                    slot.stage(value)
+                for slot, value in slots:
+                    slot.publish()
+            finally:
+                for lock in locks:
+                    lock.release()
+                self.generation += 1
+
+        entries = collections.defaultdict(list)
+        for key, (value, callback) in updates.iteritems():
+            self._store(key, value)
+            if callback:
+                entries[self._queue_index(key)].append(
+                    (key, value, callback,
+                     self.coalesce or key in self._coalesced_keys))
+        if entries and not self._workers:
+            self._start_workers()
+        for index, queue_entries in entries.iteritems():
+            self._queues[index].put_many(queue_entries)
+
+    def _write(self, key, value):
+        slot = self._slots.get(key)
+        if slot is not None:
+            with self._publish_lock:
+                self.generation += 1
+                try:
+                    slot.write(value)
+                finally:
+                    self.generation += 1
+        self._store(key, value)
+
+    def _store(self, key, value):
+        self.dictionary[key] = value
+
+    def slot(self, key):
+        """
+        Double-buffered slot holding the value of a key, created on first use
+        from the current value. Nodes that read their value every tick should
+        keep the slot and call :py:meth:`ValueSlot.read` instead of indexing
+        the container.
+
+        :param key: The :py:mod:`.robot_models` object to track
+        :type key: class from :py:mod:`.robot_models`
+        :rtype: ValueSlot
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = ValueSlot(self.dictionary[key])
+        return slot
+
+    def sample(self, time):
+        """
+        Copy the current value of every slot into :py:attr:`ValueSlot.sample`
+        once per simulator tick. The copy is taken between two generations,
+        so every node of the tick sees the same updates, and a batch is
+        either entirely visible or not at all. Nodes call this with the time
+        of the tick before reading their slot's sample.
+
+        :param time: The current simulation time
+        :type time: float
+        """
+        if time == self._sample_time:
+            return
+        self._sample_time = time
+        while True:
+            generation = self.generation
+            if generation == self._sample_generation:
+                return
+            if generation % 2 == 0:
+                for slot in self._slots.values():
+                    slot.sample[...] = slot.read()
+                    slot.sample_sequence = slot.sequence
+                if generation == self.generation:
+                    self._sample_generation = generation
+                    return
+
+    def _queue_index(self, key):
+        return hash(key) % len(self._queues)
+
+    def _dispatch(self, key, value, callback):
+        if not self._workers:
+            self._start_workers()
+        self._queues[self._queue_index(key)].put(
+            key, value, callback,
+            self.coalesce or key in self._coalesced_keys)
+
+    def _start_workers(self):
+        with self._workers_lock:
+            if self._workers:
+                return
+            for index, queue in enumerate(self._queues):
+                worker = ContainerThread(self, queue)
+                worker.name = "ContainerThread-" + str(index)
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def bind(self, container_thread):
+        """
+        Make a single thread responsible for running all the callbacks of the
+        container. Worker threads that are already running finish the
+        callbacks they have pending and stop; callbacks left in queues that
+        had no worker are dropped. The counters of the replaced queues are
+        still included in :py:attr:`stats`.
+
+        :param container_thread: The thread that will consume the callbacks
+        :type container_thread: ContainerThread
+        :return: The queue the thread has to consume
+        :rtype: DispatchQueue
+        """
+        queue = DispatchQueue(self.queue_size, self.overflow)
+        with self._workers_lock:
+            previous_queues, previous_workers = self._queues, self._workers
+            self._retired_queues.extend(previous_queues)
+            self._queues = [queue]
+            self._workers = [container_thread]
+        for previous_queue in previous_queues:
+            previous_queue.close()
+        for worker in previous_workers:
+            if worker.is_alive():
+                worker.join()
+        for previous_queue in previous_queues:
+            previous_queue.clear()
+        return queue
+
+    @property
+    def stats(self):
+        """
+        Counters of the callback dispatcher
+
+        :return: The number of callbacks queued, dropped because of overflow
+            or shutdown, coalesced into a pending callback, dispatched and
+            currently pending, including those of queues replaced by
+            :py:meth:`bind`
+        :rtype: dict
+        """
+        stats = dict(queued=0, dropped=0, coalesced=0, dispatched=0,
+                     pending=0)
+        with self._workers_lock:
+            queues = self._retired_queues + self._queues
+        for queue in queues:
+            with queue.condition:
+                stats['queued'] += queue.queued
+                stats['dropped'] += queue.dropped
+                stats['coalesced'] += queue.coalesced
+                stats['dispatched'] += queue.dispatched
+                stats['pending'] += len(queue)
+        return stats
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting callbacks, run the ones still pending and stop the
+        worker threads.
+
+        :param timeout: How long to wait for each worker, in seconds
+        :type timeout: float or None
+        """
+        for queue in self._queues:
+            queue.close()
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join(timeout)
+
+    def set_coalescing(self, key, enabled=True):
+        """
+        Only deliver the newest value of a key to its callback. An update to
+        the key while a callback is still pending replaces the pending value,
+        so at most one callback per key is ever waiting.
+
+        :param key: The :py:mod:`.robot_models` object to track
+        :type key: class from :py:mod:`.robot_models`
+        :param enabled: Whether to coalesce the updates of the key
+        :type enabled: bool
+        """
+        if enabled:
+            self._coalesced_keys.add(key)
+        else:
+            self._coalesced_keys.discard(key)
 
     def set_default_callback(self, callback):
         """
@@ -66,33 +621,139 @@ class Container(object):
             See documentation for :py:meth:`~object.__getitem__` in Python
             docs.
         """
+        slot = self._slots.get(item)
+        if slot is not None:
+            return slot.read()
         return self.dictionary[item]
 
 
+class ArrayContainer(Container):
+    def __init__(self, default_callback=None, **kwargs):
+        """
+        Container that stores every value in its own fixed slice of a single
+        contiguous float64 buffer. Reading a value returns a view of its
+        slice, so per-tick reads allocate nothing, and the whole state can be
+        copied at once from :py:meth:`snapshot`.
+
+        Values are flattened when added and keep their size afterwards.
+        Adding a key reallocates the buffer and moves the slots there, but
+        views returned by indexing the container before that still point at
+        the old buffer, so all keys should be added before values are read.
+
+        :param default_callback: a default callback for all the elements in the
+            container
+        :type default_callback: callable
+        :param kwargs: Dispatch parameters. See :py:class:`Container`.
+        """
+        super(ArrayContainer, self).__init__(default_callback, **kwargs)
+        self.buffer = np.zeros(0)
+        self.slices = dict()
+        self._snapshot = self.buffer
+
+    def add(self, key, value):
+        """
+        Add the key to the container with an initial value, reserving a slice
+        of the buffer the size of the value
+
+        :param key: The :py:mod:`.robot_models` object to track
+        :type key: class from :py:mod:`.robot_models`
+        :param value: The value associated with the key
+        :type value: float or numpy.ndarray
+        :raises: ValueError if the key was added before with a different size
+            or if another key already has the same label
+        """
+        self._index_label(key)
+        value = np.asarray(value, dtype=np.float64).ravel()
+        if key in self.slices:
+            if self.dictionary[key].size != value.size:
+                raise ValueError("Cannot change the size of " + repr(key))
+            self.dictionary[key][...] = value
+            return
+
+        start = self.buffer.size
+        self.buffer = np.concatenate((self.buffer, value))
+        self.slices[key] = slice(start, self.buffer.size)
+        for k, index in self.slices.iteritems():
+            self.dictionary[k] = self.buffer[index]
+        for k, slot in self._slots.iteritems():
+            slot.buffers = (self.dictionary[k], self.dictionary[k])
+        self._snapshot = self.buffer.view()
+        self._snapshot.flags.writeable = False
+
+    def _store(self, key, value):
+        # Slots of an ArrayContainer already write into the slice
+        if key not in self._slots:
+            self.dictionary[key][...] = value
+
+    def slot(self, key):
+        """
+        Reader for the slice of a key. Writes to an ArrayContainer are copied
+        in place, so the slot is not double-buffered.
+
+        :param key: The :py:mod:`.robot_models` object to track
+        :type key: class from :py:mod:`.robot_models`
+        :rtype: ValueSlot
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = ValueSlot(self.dictionary[key])
+            slot.buffers = (self.dictionary[key], self.dictionary[key])
+        return slot
+
+    def snapshot(self):
+        """
+        Read-only view of the values of all the keys. Use
+        :py:attr:`slices` to find the values of a particular key and copy
+        the view to keep the current state.
+
+        :return: The contents of the buffer
+        :rtype: numpy.ndarray
+        """
+        return self._snapshot
+
+
 class ContainerThread(threading.Thread):
     """
         ContainerThread offers the possibility to run a container
         in a completely different thread.
+
+        The thread sleeps until the container posts an update and then runs
+        the callback, so callbacks are serialised and nothing runs while the
+        container is idle.
     """
-    def __init__(self, container):
+    def __init__(self, container, queue=None):
         """
 
         :param container: The container to run in a different thread
         :type container: Container
+        :param queue: The queue of callbacks to consume. Leave as None to run
+            all the callbacks of the container in this thread.
+        :type queue: DispatchQueue
         """
         super(ContainerThread, self).__init__(name="ContainerThread")
         self.stopped = False
         self.container = container
+        self.queue = queue if queue is not None else container.bind(self)
 
     def run(self):
         """Run the thread that holds values in a container and uses callbacks
         on updated values."""
-        print "Running thread", self.name, "..."
-        while not self.stopped:
-            pass
+        logger.log(logging.DEBUG, "Running thread " + self.name)
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                break
+            key, value, callback = entry
+            try:
+                callback(key, value)
+            except Exception:
+                logger.exception("Callback for %r failed", key)
+            self.queue.task_done()
 
-        print "Stopped thread", self.name, "."
+        logger.log(logging.DEBUG, "Stopped thread " + self.name)
 
     def stop(self):
-        """Stop the thread from running."""
+        """Stop the thread from running. Callbacks that are already pending
+        still run before the thread exits."""
         self.stopped = True
+        self.queue.close()
@@ -0,0 +1,165 @@
+__author__ = 'Petrut Bogdan'
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Behaviours of an AlanRobot
+GESTURE = "gesture"
+SILENCE = "silence"
+IDLE = "idle"
+
+# States of the conversation
+LISTENING = "listening"
+INTERRUPTED = "interrupted"
+
+# Kinds of events
+SPEECH = "speech"
+STOP = "stop"
+RESUME = "resume"
+
+# Furhat event name -> kind of event
+EVENT_KINDS = {
+    "action.speech": SPEECH,
+    "action.speech.stop": STOP,
+}
+
+# Displayed text that makes a speech event a RESUME, in lower case
+RESUME_PHRASES = ("hm what was i saying", "oh what were you saying",
+                  "where were we")
+
+# (state, kind of event) -> (behaviour of the robot the event is about,
+# next state). Missing pairs are ignored.
+TRANSITIONS = {
+    (LISTENING, SPEECH): (GESTURE, LISTENING),
+    (LISTENING, STOP): (SILENCE, INTERRUPTED),
+    (LISTENING, RESUME): (IDLE, LISTENING),
+    (INTERRUPTED, STOP): (SILENCE, INTERRUPTED),
+    (INTERRUPTED, RESUME): (IDLE, LISTENING),
+}
+
+# Kinds of event that act on the robot of the default agent, whatever agent
+# they carry. Furhat's stop events do not reliably say who was interrupted,
+# and the show has always silenced the first robot (luke) when they arrive.
+DEFAULT_AGENT_KINDS = (STOP,)
+
+
+class BehaviourDispatcher(object):
+    def __init__(self, agents, default_agent=None, transitions=None,
+                 event_kinds=None, resume_phrases=RESUME_PHRASES,
+                 default_agent_kinds=DEFAULT_AGENT_KINDS):
+        """
+        Drives any number of robots from one stream of Furhat events.
+
+        Each event is classified (see :py:meth:`kind`) and looked up, with
+        the current state, in the transition table, which gives the behaviour
+        of the robot the event is about and the next state. The robot is the
+        one of the default agent for the kinds of event in
+        ``default_agent_kinds``, and otherwise the one of the agent of the
+        event or, for events without one, the robot that spoke last. Every
+        other robot that is not idle is made idle.
+        Only robots that are not idle are tracked, so an event costs the same
+        whatever the number of robots.
+
+        With the defaults, a robot gestures while its agent speaks, the robot
+        of the default agent silences when speech is interrupted, whoever was
+        speaking (speech is ignored until then), and the robots idle when the
+        conversation resumes.
+
+        :param agents: Furhat agent ID -> robot, an object with the
+            ``gesture``, ``silence`` and ``idle`` methods of an
+            :py:class:`~robot_interface.alan_robot.AlanRobot`
+        :type agents: dict
+        :param default_agent: The agent whose robot handles the kinds of
+            event in ``default_agent_kinds``, and events without an agent
+            before any robot has spoken
+        :type default_agent: str
+        :param transitions: (state, kind of event) -> (behaviour, next state).
+            Defaults to :py:data:`TRANSITIONS`.
+        :type transitions: dict
+        :param event_kinds: Furhat event name -> kind of event. Defaults to
+            :py:data:`EVENT_KINDS`.
+        :type event_kinds: dict
+        :param resume_phrases: Displayed text, in lower case, that marks the
+            end of an interruption
+        :type resume_phrases: tuple
+        :param default_agent_kinds: The kinds of event that act on the robot
+            of the default agent, if there is one. Defaults to
+            :py:data:`DEFAULT_AGENT_KINDS`.
+        :type default_agent_kinds: tuple
+        """
+        if default_agent is not None and default_agent not in agents:
+            raise ValueError("Unknown default agent %r" % (default_agent,))
+        self.agents = dict(agents)
+        self.transitions = dict(TRANSITIONS if transitions is None else
+                                transitions)
+        self.event_kinds = dict(EVENT_KINDS if event_kinds is None else
+                                event_kinds)
+        self.resume_phrases = tuple(resume_phrases)
+        self.default_agent = default_agent
+        self.default_agent_kinds = tuple(default_agent_kinds)
+
+        self.state = LISTENING
+        self.speaker = default_agent
+        # Agent -> behaviour of the robots that are not idle. The robots start
+        # gesturing, so all of them are at first.
+        self.active = dict((agent, GESTURE) for agent in self.agents)
+        self.dispatched = 0
+        self.ignored = 0
+
+    def kind(self, event):
+        """
+        :param event: A parsed Furhat event
+        :type event: robot_interface.furhat_events.SpeechEvent
+        :return: The kind of the event, or None if it is not handled
+        :rtype: str
+        """
+        kind = self.event_kinds.get(event.name)
+        if kind == SPEECH and event.display is not None:
+            display = event.display.strip().lower()
+            for phrase in self.resume_phrases:
+                if phrase in display:
+                    return RESUME
+        return kind
+
+    def dispatch(self, event):
+        """
+        Make the robots act on an event.
+
+        :param event: A parsed Furhat event
+        :type event: robot_interface.furhat_events.SpeechEvent
+        :return: Whether the event changed the behaviour of a robot or the
+            state
+        :rtype: bool
+        """
+        kind = self.kind(event)
+        transition = self.transitions.get((self.state, kind))
+        if (kind in self.default_agent_kinds and
+                self.default_agent is not None):
+            agent = self.default_agent
+        else:
+            agent = event.agent if event.agent in self.agents else None
+            if agent is None and event.agent is None:
+                agent = self.speaker
+        if transition is None or agent is None:
+            self.ignored += 1
+            return False
+        behaviour, state = transition
+        logger.log(logging.DEBUG, "%s in state %s: %s %s", event.name,
+                   self.state, behaviour, agent)
+
+        for other in [other for other in self.active if other != agent]:
+            self._apply(other, IDLE)
+        self._apply(agent, behaviour)
+        if behaviour != IDLE:
+            self.speaker = agent
+        self.state = state
+        self.dispatched += 1
+        return True
+
+    def _apply(self, agent, behaviour):
+        getattr(self.agents[agent], behaviour)()
+        if behaviour == IDLE:
+            self.active.pop(agent, None)
+        else:
+            self.active[agent] = behaviour
@@ -0,0 +1,238 @@
+__author__ = 'Petrut Bogdan'
+
+import collections
+import logging
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A message from the Furhat broker. Events have a name (e.g.
+# "action.speech") and a payload; other messages (e.g. "CONNECTED") only have
+# a command.
+FurhatMessage = collections.namedtuple("FurhatMessage",
+                                       ["command", "name", "payload"])
+
+EVENT = "EVENT"
+CONNECTED = "CONNECTED"
+
+
+class EventFramer(object):
+    def __init__(self, max_size=1 << 16):
+        """
+        Splits the byte stream of the Furhat broker into complete messages,
+        whatever the boundaries of the chunks it is received in.
+
+        An event is an ``EVENT <name> <size>`` line followed by a payload of
+        exactly ``size`` bytes, which may span several lines. If the header
+        has no size, the payload is the next line. Any other line is a
+        message on its own.
+
+        :param max_size: The longest line or payload accepted, in bytes.
+            Longer ones are dropped, so a corrupted size cannot make the
+            buffer grow without bound.
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.buffer = bytearray()
+        # (name, size) of an event whose payload has not arrived yet
+        self.header = None
+        self.errors = 0
+
+    def feed(self, data):
+        """
+        :param data: The bytes received
+        :type data: str or bytearray
+        :return: The messages completed by these bytes
+        :rtype: list of FurhatMessage
+        """
+        self.buffer += data
+        buffer = self.buffer
+        messages = []
+        start = 0
+        while True:
+            if self.header is not None and self.header[1] is not None:
+                name, size = self.header
+                if len(buffer) - start < size:
+                    break
+                payload = bytes(buffer[start:start + size])
+                start += size
+                self.header = None
+                messages.append(FurhatMessage(
+                    EVENT, name, payload.decode("utf-8", "replace")))
+                continue
+
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                if len(buffer) - start > self.max_size:
+                    self.errors += 1
+                    self.header = None
+                    start = len(buffer)
+                break
+            line = bytes(buffer[start:end]).decode("utf-8", "replace").rstrip(
+                u"\r")
+            start = end + 1
+
+            if self.header is not None:
+                # An event without a size: its payload is this line
+                messages.append(FurhatMessage(EVENT, self.header[0], line))
+                self.header = None
+                continue
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] != EVENT:
+                messages.append(FurhatMessage(parts[0], None, None))
+                continue
+            if len(parts) < 2:
+                self.errors += 1
+                continue
+            size = None
+            if len(parts) > 2:
+                try:
+                    size = int(parts[2])
+                except ValueError:
+                    size = None
+                if size is not None and not 0 <= size <= self.max_size:
+                    self.errors += 1
+                    continue
+            self.header = (parts[1], size)
+        del buffer[:start]
+        return messages
+
+
+class FurhatClient(object):
+    def __init__(self, host="127.0.0.1", port=1932, ticket="myticket",
+                 name="Python", subscriptions=(), handler=None,
+                 connect=socket.create_connection, buffer_size=4096):
+        """
+        Client of the Furhat event broker. A thread blocks on the socket and
+        passes each event to the handler as soon as it has been received in
+        full, so there is no polling delay and no event is lost when it is
+        split across reads.
+
+        :param host: The address of the broker
+        :type host: str
+        :param port: The port of the broker
+        :type port: int
+        :param ticket: The ticket to connect with
+        :type ticket: str
+        :param name: The name this client connects under
+        :type name: str
+        :param subscriptions: The names of the events to subscribe to
+        :type subscriptions: list
+        :param handler: Called with every event, as a
+            :py:data:`FurhatMessage`, in the thread of the client
+        :type handler: callable
+        :param connect: Callable that opens the connection, called with
+            ``(host, port)``
+        :type connect: callable
+        :param buffer_size: The most bytes read from the socket at once
+        :type buffer_size: int
+        """
+        self.address = (host, port)
+        self.ticket = ticket
+        self.name = name
+        self.subscriptions = list(subscriptions)
+        self.handler = handler
+        self.connect = connect
+        self.buffer_size = buffer_size
+
+        self.socket = None
+        self.framer = EventFramer()
+        self.connected = threading.Event()
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self.events = 0
+
+    def start(self):
+        """
+        Connect to the broker, subscribe to the events and start receiving
+        them.
+        """
+        self.socket = self.connect(self.address)
+        self._thread = threading.Thread(target=self._receive,
+                                        name="FurhatClient")
+        self._thread.daemon = True
+        self._thread.start()
+        self.send("CONNECT %s %s" % (self.ticket, self.name))
+        if self.subscriptions:
+            self.subscribe(*self.subscriptions)
+
+    def wait_connected(self, timeout=None):
+        """
+        :param timeout: Seconds to wait for the broker to accept the
+            connection
+        :type timeout: float
+        :return: Whether the broker accepted the connection
+        :rtype: bool
+        """
+        self.connected.wait(timeout)
+        return self.connected.is_set()
+
+    def subscribe(self, *names):
+        """
+        :param names: The names of the events to receive
+        :type names: str
+        """
+        self.send("SUBSCRIBE " + " ".join(names))
+
+    def send(self, line):
+        """
+        Send a command to the broker.
+
+        :param line: The command, without the line ending
+        :type line: str
+        """
+        with self._send_lock:
+            self.socket.sendall(bytearray(line + "\n", "utf-8"))
+        logger.log(logging.DEBUG, "Sent %s", line)
+
+    def _receive(self):
+        while not self.closed:
+            try:
+                data = self.socket.recv(self.buffer_size)
+            except socket.error as error:
+                if not self.closed:
+                    logger.error("Lost the connection to Furhat (%s)", error)
+                break
+            if not data:
+                logger.log(logging.DEBUG, "Furhat closed the connection")
+                break
+            for message in self.framer.feed(data):
+                self._dispatch(message)
+        self.closed = True
+
+    def _dispatch(self, message):
+        if message.command == CONNECTED:
+            self.connected.set()
+        elif message.command == EVENT:
+            self.events += 1
+            if self.handler is not None:
+                try:
+                    self.handler(message)
+                except Exception:
+                    logger.exception("Handler failed on %s", message.name)
+
+    def close(self, timeout=1.0):
+        """
+        Tell the broker the client is leaving and stop receiving.
+
+        :param timeout: Seconds to wait for the receiving thread
+        :type timeout: float
+        """
+        if self.socket is None:
+            return
+        try:
+            self.send("CLOSE")
+        except socket.error:
+            pass
+        self.closed = True
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.socket.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
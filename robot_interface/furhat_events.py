@@ -0,0 +1,68 @@
+__author__ = 'Petrut Bogdan'
+
+import collections
+import json
+
+# An event from Furhat, reduced to what the behaviours need: the name of the
+# event (e.g. "action.speech"), the agent it concerns and the text displayed,
+# both None if the event does not carry them
+SpeechEvent = collections.namedtuple("SpeechEvent",
+                                     ["name", "agent", "display"])
+
+# Payloads longer than this are rejected without being decoded
+MAX_PAYLOAD = 1 << 14
+
+_decode = json.JSONDecoder().raw_decode
+
+
+def _text(value):
+    if value is None or isinstance(value, basestring):
+        return value
+    raise ValueError("Expected text, got " + type(value).__name__)
+
+
+def parse(name, payload):
+    """
+    Decode the payload of a Furhat event in one pass. The payload is the JSON
+    object the broker sends after the ``EVENT`` line, so the display text
+    can contain commas, colons and quotes.
+
+    :param name: The name of the event, or None to read it from the
+        ``event_name`` field of the payload
+    :type name: str
+    :param payload: The JSON payload of the event
+    :type payload: str
+    :return: The event, or None if the payload is malformed
+    :rtype: SpeechEvent
+    """
+    # Cheap checks first, so garbage is not handed to the decoder
+    if not payload or len(payload) > MAX_PAYLOAD:
+        return None
+    start = 0
+    while payload[start] in " \t\r\n":
+        start += 1
+        if start == len(payload):
+            return None
+    if payload[start] != "{":
+        return None
+    try:
+        fields, end = _decode(payload, start)
+        if payload[end:].strip():
+            return None
+        return SpeechEvent(name if name is not None else
+                           _text(fields.get("event_name")),
+                           _text(fields.get("agent")),
+                           _text(fields.get("display")))
+    except ValueError:
+        return None
+
+
+def parse_event(message):
+    """
+    :param message: An event received by the
+        :py:class:`~robot_interface.furhat_client.FurhatClient`
+    :type message: robot_interface.furhat_client.FurhatMessage
+    :return: The event, or None if it is malformed
+    :rtype: SpeechEvent
+    """
+    return parse(message.name, message.payload)
@@ -0,0 +1,94 @@
+__author__ = 'Petrut Bogdan'
+
+import logging
+import threading
+import time
+
+from alan_robot import AlanRobot
+
+logger = logging.getLogger(__name__)
+
+
+class RobotLauncher(object):
+    def __init__(self, robot_parameters, simulator_factory=None,
+                 **shared_parameters):
+        """
+        Builds and boots several :py:class:`.AlanRobot` at the same time, one
+        thread per robot, and starts their simulations together.
+
+        Most of the time spent booting a robot on SpiNNaker is spent waiting
+        on the board, so building the robots in parallel takes about as long
+        as building the slowest one.
+
+        :param robot_parameters: The name of each robot mapped to the
+            parameters specific to it (e.g. hostname, width and height of the
+            board)
+        :type robot_parameters: dict
+        :param simulator_factory: Callable that builds the simulator of each
+            robot. See :py:class:`.AlanRobot`.
+        :type simulator_factory: callable
+        :param shared_parameters: Parameters common to all the robots (e.g.
+            run_time and period)
+        :type shared_parameters: dict
+        """
+        self.robot_parameters = robot_parameters
+        self.simulator_factory = simulator_factory
+        self.shared_parameters = shared_parameters
+
+        self.robots = dict()
+        # Seconds spent by each robot in each phase of the launch
+        self.timings = dict()
+
+    def launch(self):
+        """
+        Build all the robots in parallel.
+
+        :return: The robots, by name
+        :rtype: dict
+        :raises: RuntimeError if any of the robots could not be built
+        """
+        errors = dict()
+        threads = []
+        for name in self.robot_parameters:
+            thread = threading.Thread(target=self._build, args=(name, errors),
+                                      name="RobotLauncher-" + str(name))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise RuntimeError("Could not build " + ", ".join(
+                "%s (%s)" % (name, error) for name, error in
+                sorted(errors.items())))
+        return self.robots
+
+    def _build(self, name, errors):
+        parameters = dict(self.shared_parameters)
+        parameters.update(self.robot_parameters[name])
+        start = time.time()
+        try:
+            robot = AlanRobot(simulator_factory=self.simulator_factory,
+                              **parameters)
+        except Exception as error:
+            logger.exception("Could not build robot %s", name)
+            errors[name] = error
+            return
+        self.robots[name] = robot
+        self.timings[name] = dict(robot.timings,
+                                  total=time.time() - start)
+        logger.log(logging.DEBUG, "Built robot %s in %.2fs" % (
+            name, self.timings[name]['total']))
+
+    def start(self):
+        """Start the simulations of all the robots."""
+        start = time.time()
+        for robot in self.robots.itervalues():
+            robot.start_simulation()
+        for name in self.robots:
+            self.timings[name]['start'] = time.time() - start
+
+    def stop(self):
+        """Stop the simulations of all the robots."""
+        for robot in self.robots.itervalues():
+            robot.stop_simulation()
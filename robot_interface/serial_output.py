@@ -0,0 +1,460 @@
+__author__ = 'Petrut Bogdan'
+
+import collections
+import functools
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Byte that starts every frame. No other byte of a frame can take this value,
+# so a receiver that lost bytes resynchronises on the next frame.
+START = 0xFF
+# The joint mask uses 7 bits, so a frame addresses at most 7 joints
+MAX_JOINTS = 7
+# Largest servo position that can be sent
+MAX_POSITION = 0xFE
+# Baud rate of the Arduinos
+BAUD_RATE = 57600
+# Seconds a write can block before the link is considered lost
+WRITE_TIMEOUT = 0.1
+
+
+def checksum(mask, positions):
+    """
+    :param mask: The joint mask byte of a frame
+    :type mask: int
+    :param positions: The positions carried by the frame
+    :type positions: numpy.ndarray
+    :return: The sum of the mask and positions, modulo 128
+    :rtype: int
+    """
+    return (int(mask) + int(np.sum(positions, dtype=np.int64))) & 0x7F
+
+
+def encode(mask, positions):
+    """
+    Pack the positions of the joints of a servo group that changed into a
+    single frame: the start byte, the joint mask (bit i set if joint i is
+    included), one byte per included joint, in joint order, and a checksum.
+    See :ref:`serial_protocol`.
+
+    :param mask: Which joints of the group are included
+    :type mask: numpy.ndarray of bool
+    :param positions: The position of each included joint
+    :type positions: numpy.ndarray of uint8
+    :return: The frame, ready to be written in one call
+    :rtype: bytearray
+    :raises: ValueError if the mask and positions do not match or the frame
+        cannot be represented
+    """
+    joints = np.flatnonzero(mask)
+    if len(mask) > MAX_JOINTS:
+        raise ValueError("A frame addresses at most %d joints" % MAX_JOINTS)
+    if len(joints) != len(positions):
+        raise ValueError("Expected %d positions, got %d" % (len(joints),
+                                                            len(positions)))
+    if np.any(np.asarray(positions) > MAX_POSITION):
+        raise ValueError("Servo positions must be at most %d" % MAX_POSITION)
+    mask_byte = int(np.sum(1 << joints))
+    frame = bytearray(len(joints) + 3)
+    frame[0] = START
+    frame[1] = mask_byte
+    frame[2:-1] = bytearray(np.asarray(positions, dtype=np.uint8).tobytes())
+    frame[-1] = checksum(mask_byte, positions)
+    return frame
+
+
+class FrameDecoder(object):
+    def __init__(self, joints=MAX_JOINTS):
+        """
+        Reassembles frames from a stream of bytes, the way the Arduino side of
+        the link does. Bytes before a start byte and frames with a bad
+        checksum are dropped.
+
+        :param joints: The number of joints of the servo group
+        :type joints: int
+        """
+        self.joints = joints
+        self.frame = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        """
+        :param data: The bytes received
+        :type data: bytearray or str
+        :return: The ``(joint mask, positions)`` of every complete frame, with
+            the mask as an array of bool and positions as an array indexed
+            by joint (0 for the joints not included)
+        :rtype: list
+        """
+        frames = []
+        for byte in bytearray(data):
+            if byte == START:
+                if len(self.frame) > 0:
+                    # The previous frame was cut short
+                    self.errors += 1
+                self.frame = bytearray([byte])
+                continue
+            if len(self.frame) == 0:
+                continue
+            self.frame.append(byte)
+            mask_byte = self.frame[1]
+            if mask_byte >> self.joints:
+                self.errors += 1
+                self.frame = bytearray()
+                continue
+            mask = np.array([(mask_byte >> joint) & 1 for joint in
+                             range(self.joints)], dtype=bool)
+            if len(self.frame) < np.count_nonzero(mask) + 3:
+                continue
+            positions = np.array(self.frame[2:-1], dtype=np.uint8)
+            if checksum(mask_byte, positions) == self.frame[-1]:
+                values = np.zeros(self.joints, dtype=np.uint8)
+                values[mask] = positions
+                frames.append((mask, values))
+            else:
+                self.errors += 1
+            self.frame = bytearray()
+        return frames
+
+
+def serial_port(port, baudrate=BAUD_RATE, write_timeout=WRITE_TIMEOUT,
+                serial_class=None):
+    """
+    Build the callable a :py:class:`SerialWriter` opens its port with.
+
+    Ports are numbered as in the baseline (``4`` is ``COM5`` on Windows),
+    which only pyserial 2.x supports, so the timeout is passed under its
+    pyserial 2.x name, ``writeTimeout``.
+
+    :param port: The number or name of the port
+    :type port: int or str
+    :param baudrate: The baud rate of the link
+    :type baudrate: int
+    :param write_timeout: Seconds a write can block before it fails
+    :type write_timeout: float
+    :param serial_class: The class of the port. Leave as None to use
+        ``serial.Serial``.
+    :type serial_class: type
+    :return: Callable that opens the port
+    :rtype: callable
+    """
+    if serial_class is None:
+        import serial
+        serial_class = serial.Serial
+    return functools.partial(serial_class, port, baudrate,
+                             writeTimeout=write_timeout)
+
+
+class SerialWriter(threading.Thread):
+    def __init__(self, connect, name="SerialWriter", min_backoff=0.1,
+                 max_backoff=5.0, window=1.0):
+        """
+        Owns one serial port and is the only thread that writes to it.
+
+        Updates are posted with :py:meth:`send`, which never blocks on the
+        link: each servo group has a single pending update, into which newer
+        updates are merged until the writer gets to it, so the queue is
+        bounded by the number of servo groups and only the latest positions
+        are sent. If the port cannot be opened or written (an
+        :py:class:`EnvironmentError`, which serial exceptions are), the link
+        is closed and reopened after a delay that doubles with every failure,
+        up to ``max_backoff``. Any other error is a bug: it is logged, the
+        thread stops and :py:meth:`send` raises it from then on.
+
+        :param connect: Callable that opens the port and returns an object
+            with a ``write`` method, e.g. one made by :py:func:`serial_port`
+        :type connect: callable
+        :param name: The name of the thread
+        :type name: str
+        :param min_backoff: Seconds to wait before the first reconnection
+        :type min_backoff: float
+        :param max_backoff: The longest wait between two reconnections
+        :type max_backoff: float
+        :param window: Seconds over which the throughput is measured
+        :type window: float
+        """
+        super(SerialWriter, self).__init__(name=name)
+        self.daemon = True
+        self.connect = connect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.window = window
+        self.link = None
+        self.stopped = False
+        # The error that stopped the thread, if any
+        self.failure = None
+        self.condition = threading.Condition()
+        self._wake = threading.Event()
+        # Servo group -> [joint mask, positions by joint] not yet written
+        self.pending = collections.OrderedDict()
+        # Servo group -> positions of all the joints as last queued
+        self.queued = dict()
+
+        self.frames = 0
+        self.bytes = 0
+        self.merged = 0
+        self.errors = 0
+        self.connections = 0
+        self.latency = 0.
+        self.max_latency = 0.
+        self._total_latency = 0.
+        self._recent = collections.deque()
+
+    def send(self, key, mask, positions):
+        """
+        Queue the positions of the joints of a servo group that changed.
+
+        :param key: The servo group
+        :type key: object
+        :param mask: Which joints changed
+        :type mask: numpy.ndarray of bool
+        :param positions: The position of each joint that changed
+        :type positions: numpy.ndarray of uint8
+        :raises: RuntimeError if the thread was stopped by an error
+        """
+        if self.failure is not None:
+            raise RuntimeError("%s failed: %r" % (self.name, self.failure))
+        mask = np.asarray(mask, dtype=bool)
+        with self.condition:
+            entry = self.pending.get(key)
+            if entry is None:
+                values = np.zeros(len(mask), dtype=np.uint8)
+                values[mask] = positions
+                self.pending[key] = [mask.copy(), values]
+                self.condition.notify()
+            else:
+                entry[0] |= mask
+                entry[1][mask] = positions
+                self.merged += 1
+
+    def update(self, key, positions):
+        """
+        Queue the joints of a servo group whose position differs from the one
+        last queued for them. Unlike a mask computed upstream, this cannot
+        lose a change when updates are coalesced or dropped before they get
+        here. The first update of a group sends all its joints.
+
+        :param key: The servo group
+        :type key: object
+        :param positions: The position of every joint of the group
+        :type positions: numpy.ndarray of uint8
+        """
+        positions = np.array(positions, dtype=np.uint8)
+        with self.condition:
+            last = self.queued.get(key)
+            if last is None:
+                mask = np.ones(len(positions), dtype=bool)
+            else:
+                mask = positions != last
+            if mask.any():
+                self.queued[key] = positions
+                self.send(key, mask, positions[mask])
+
+    def run(self):
+        """Write the pending updates as they come, one frame at a time."""
+        logger.log(logging.DEBUG, "Running thread " + self.name)
+        try:
+            self._run()
+        except Exception as error:
+            logger.exception("%s stopped by an error", self.name)
+            self.failure = error
+        finally:
+            self._close()
+        logger.log(logging.DEBUG, "Stopped thread " + self.name)
+
+    def _run(self):
+        backoff = self.min_backoff
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if not self.pending:
+                    break
+                key, (mask, values) = self.pending.popitem(last=False)
+            if self._write(encode(mask, values[mask])):
+                backoff = self.min_backoff
+                continue
+            self._requeue(key, mask, values)
+            if self.stopped:
+                break
+            self._wake.wait(backoff)
+            backoff = min(2 * backoff, self.max_backoff)
+
+    def _write(self, frame):
+        try:
+            if self.link is None:
+                self.link = self.connect()
+                self.connections += 1
+            start = time.time()
+            written = self.link.write(frame)
+            latency = time.time() - start
+            if written is not None and written < len(frame):
+                raise IOError("Wrote %d of %d bytes" % (written, len(frame)))
+        except EnvironmentError as error:
+            logger.warning("%s: could not write to the serial port (%s)",
+                           self.name, error)
+            with self.condition:
+                self.errors += 1
+            self._close()
+            return False
+        with self.condition:
+            self.frames += 1
+            self.bytes += len(frame)
+            self.latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._total_latency += latency
+            self._recent.append((start, len(frame)))
+        return True
+
+    def _requeue(self, key, mask, values):
+        # Put back an update that could not be written, under any newer one
+        with self.condition:
+            entry = self.pending.pop(key, None)
+            if entry is not None:
+                values[entry[0]] = entry[1][entry[0]]
+                mask = mask | entry[0]
+            self.pending[key] = [mask, values]
+
+    def _close(self):
+        link, self.link = self.link, None
+        if link is not None and hasattr(link, 'close'):
+            try:
+                link.close()
+            except Exception:
+                logger.exception("%s: could not close the serial port",
+                                 self.name)
+
+    @property
+    def stats(self):
+        """
+        :return: The frames and bytes written, the throughput in bytes per
+            second, the number of servo groups waiting to be written, the
+            updates merged into a pending one, the failed writes, the times
+            the port was opened and the last, mean and largest write latency
+            in seconds
+        :rtype: dict
+        """
+        with self.condition:
+            horizon = time.time() - self.window
+            while self._recent and self._recent[0][0] < horizon:
+                self._recent.popleft()
+            return dict(
+                frames=self.frames, bytes=self.bytes,
+                bytes_per_second=sum(size for _, size in self._recent) /
+                self.window,
+                queue_depth=len(self.pending), merged=self.merged,
+                errors=self.errors, connections=self.connections,
+                latency=self.latency, max_latency=self.max_latency,
+                mean_latency=self._total_latency / self.frames
+                if self.frames else 0.)
+
+    def stop(self, timeout=None):
+        """
+        Write what is pending, if the link is up, and stop the thread.
+
+        :param timeout: Seconds to wait for the thread to finish
+        :type timeout: float
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class SerialOutputManager(object):
+    def __init__(self, **writer_parameters):
+        """
+        Sends the updates of the servo groups to their serial ports, each
+        port being written by its own :py:class:`SerialWriter`, so the
+        callbacks of the servos never wait on a USB link.
+
+        :param writer_parameters: Parameters of every writer, e.g.
+            ``max_backoff``
+        :type writer_parameters: dict
+        """
+        self.writer_parameters = writer_parameters
+        self.writers = dict()
+        self.routes = dict()
+
+    def add_port(self, port, connect):
+        """
+        Start the writer of a port.
+
+        :param port: The name of the port
+        :type port: object
+        :param connect: Callable that opens the port. See
+            :py:class:`SerialWriter`.
+        :type connect: callable
+        :return: The writer of the port
+        :rtype: SerialWriter
+        """
+        if port in self.writers:
+            raise ValueError("Port %r was already added" % (port,))
+        writer = SerialWriter(connect, name="SerialWriter-" + str(port),
+                              **self.writer_parameters)
+        self.writers[port] = writer
+        writer.start()
+        return writer
+
+    def route(self, key, port):
+        """
+        Send the updates of a servo group to a port.
+
+        :param key: The servo group
+        :type key: object
+        :param port: The name of a port that was added
+        :type port: object
+        """
+        self.routes[key] = self.writers[port]
+
+    def send(self, key, mask, positions):
+        """
+        Queue an update of a servo group for its port. Never blocks.
+
+        :param key: The servo group
+        :type key: object
+        :param mask: Which joints changed
+        :type mask: numpy.ndarray of bool
+        :param positions: The position of each joint that changed
+        :type positions: numpy.ndarray of uint8
+        """
+        self.routes[key].send(key, mask, positions)
+
+    def update(self, key, positions):
+        """
+        Queue the joints of a servo group that changed since they were last
+        queued. See :py:meth:`SerialWriter.update`. Never blocks.
+
+        :param key: The servo group
+        :type key: object
+        :param positions: The position of every joint of the group
+        :type positions: numpy.ndarray of uint8
+        """
+        self.routes[key].update(key, positions)
+
+    @property
+    def stats(self):
+        """
+        :return: The statistics of each port (see
+            :py:attr:`SerialWriter.stats`)
+        :rtype: dict
+        """
+        return dict((port, writer.stats) for port, writer in
+                    self.writers.iteritems())
+
+    def close(self, timeout=None):
+        """
+        Stop all the writers.
+
+        :param timeout: Seconds to wait for each writer
+        :type timeout: float
+        """
+        for writer in self.writers.itervalues():
+            writer.stop(timeout)
@@ -2,25 +2,48 @@ __author__ = 'Petrut Bogdan'
 
 import logging
 import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
 class SimulationControl(threading.Thread):
-    def __init__(self, simulator, run_time=None):
+    def __init__(self, simulator, run_time=None, chunk_steps=100,
+                 realtime=False, max_lag=1.0):
         """
         A class that controls the simulation. It provides start and stop control
         over the simulation.
 
+        Simulators that cannot be stopped while running (e.g. the reference
+        :py:class:`nengo.Simulator`) are run in chunks of steps, either as
+        fast as possible or paced against the wall clock.
+
         :param simulator: A neural simulator
         :type simulator: :py:class:`nengo.simulator.Simulator`
             or :py:class:`nengo_spinnaker.simulator.Simulator`
         :param run_time: Time in seconds
         :type run_time: int
+        :param chunk_steps: The number of steps run at once. :py:meth:`stop`
+            takes effect at the end of the current chunk.
+        :type chunk_steps: int > 0
+        :param realtime: Whether to keep simulated time in step with the wall
+            clock, sleeping when ahead and catching up when behind
+        :type realtime: bool
+        :param max_lag: How far behind the wall clock, in seconds, a real time
+            simulation can fall before it stops trying to catch up
+        :type max_lag: float
         """
         super(SimulationControl, self).__init__(name="SimulationControl Thread")
         self.simulator = simulator
         self.run_time = run_time
+        self.chunk_steps = chunk_steps
+        self.realtime = realtime
+        self.max_lag = max_lag
+        self.stopped = False
+
+        # Simulated and wall clock time spent in the simulation, in seconds
+        self.simulated_time = 0.
+        self.wall_time = 0.
 
     def run(self):
         """
@@ -34,13 +57,62 @@ class SimulationControl(threading.Thread):
 
         if hasattr(self.simulator, '__exit__'):
             with self.simulator:
-                self.simulator.run(self.run_time)
+                self._run()
         else:
+            self._run()
+
+    def _run(self):
+        start = time.time()
+        if hasattr(self.simulator, 'stop') or not hasattr(self.simulator,
+                                                          'run_steps'):
             self.simulator.run(self.run_time)
+            self.wall_time = time.time() - start
+            self.simulated_time = self.run_time or self.wall_time
+            return
+
+        dt = self.simulator.dt
+        steps = None if self.run_time is None else int(
+            round(self.run_time / dt))
+        # Wall clock time at which the simulation would have started had it
+        # always kept up
+        origin = start
+        while not self.stopped and (steps is None or steps > 0):
+            chunk = self.chunk_steps if steps is None else min(
+                steps, self.chunk_steps)
+            self.simulator.run_steps(chunk, progress_bar=False)
+            if steps is not None:
+                steps -= chunk
+            self.simulated_time += chunk * dt
+
+            now = time.time()
+            self.wall_time = now - start
+            if self.realtime:
+                ahead = origin + self.simulated_time - now
+                if ahead > 0:
+                    time.sleep(ahead)
+                elif -ahead > self.max_lag:
+                    logger.warning("Simulation is %.2fs behind real time",
+                                   -ahead)
+                    origin = now - self.simulated_time
+        self.wall_time = time.time() - start
+
+    @property
+    def realtime_factor(self):
+        """
+        How many times faster than real time the simulation has run so far
+
+        :return: Simulated time over wall clock time, or None before any
+            simulation has run
+        :rtype: float or None
+        """
+        if not self.wall_time:
+            return None
+        return self.simulated_time / self.wall_time
 
     def stop(self):
         """Stop a continuously running simulation or cut short a fixed
         length simulation"""
         logger.log(logging.DEBUG, "Stopping the " + self.name)
+        self.stopped = True
         if hasattr(self.simulator, 'stop'):
             self.simulator.stop()
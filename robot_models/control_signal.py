@@ -2,10 +2,12 @@ __author__ = 'Petrut Bogdan'
 
 import nengo
 import numpy as np
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE
 
 
 class ControlSignal(nengo.Node):
-    def __init__(self, container, size_out, label=None):
+    def __init__(self, container, size_out, label=None, sampling_period=1,
+                 policy=FIXED_RATE, dt=0.001):
         """
         A node that controls the operation of the robot simulation by providing
         inputs to action selection and execution.
@@ -16,6 +18,15 @@ class ControlSignal(nengo.Node):
         :type size_out: int > 0
         :param label: The name of the node
         :type label: str
+        :param sampling_period: The period with which the node reads a new
+            value from the container, in ticks. The previous value is held in
+            between.
+        :type sampling_period: int
+        :param policy: The sampling policy. See
+            :py:class:`~robot_models.rate_limiter.RateLimiter`.
+        :type policy: str
+        :param dt: The time step in seconds
+        :type dt: float
         :return: A control signal node
         :rtype: ControlSignal
         """
@@ -23,7 +34,11 @@ class ControlSignal(nengo.Node):
         super(ControlSignal, self).__init__(output=self.control_signal_output,
                                             size_out=size_out,
                                             label=label)
-        self.container.add(self, np.asarray([0]*size_out))
+        self.container.add(self, np.zeros(size_out))
+        self.slot = self.container.slot(self)
+        self.rate = RateLimiter(sampling_period, policy, dt)
+        self.sequence = self.slot.sample_sequence
+        self.sample = np.array(self.slot.sample)
 
     def control_signal_output(self, time):
         """
@@ -34,8 +49,11 @@ class ControlSignal(nengo.Node):
         :type time: float
         :return: An array of size size_out
         :rtype: np.ndarray
-        :raises: KeyError if control signal output not assigned in container
-            before simulation starts
         """
-        # TODO Make transmit period be adjustable
-        return self.container[self]
+        self.container.sample(time)
+        sequence = self.slot.sample_sequence
+        if (self.rate.ready(time, sequence != self.sequence) and
+                sequence != self.sequence):
+            self.sequence = sequence
+            self.sample[...] = self.slot.sample
+        return self.sample
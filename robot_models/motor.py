@@ -1,39 +1,49 @@
 __author__ = 'Petrut Bogdan'
 
 import nengo
+import numpy as np
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE
 
 
 class Motor(nengo.Node):
-    def __init__(self, container, label=None):
+    def __init__(self, container, label=None, sampling_period=1,
+                 policy=FIXED_RATE, dt=0.001):
         """
         A motor is a type of node that sends live information back for
         processing.
 
         :param container: The object that receives information from the motor
         :type container: Container
-        :param sampling_period: The period with which the motor sends information
-        :type sampling_period: float or int
-        :param dt: The time step in seconds
-        :type dt: float
         :param label: The name of the motor
         :type label: str
+        :param sampling_period: The period with which the motor sends
+            information, in ticks
+        :type sampling_period: int
+        :param policy: The transmission policy. See
+            :py:class:`~robot_models.rate_limiter.RateLimiter`.
+        :type policy: str
+        :param dt: The time step in seconds
+        :type dt: float
         :return: A motor node
         :rtype: Motor
         """
         self.container = container
+        self.rate = RateLimiter(sampling_period, policy, dt)
+        self.last_sent = np.zeros(1)
         super(Motor, self).__init__(output=self.motor_output, size_in=1,
-                                    label=label)
+                                    size_out=0, label=label)
 
     def motor_output(self, time, value):
         """
         Function that is called every time tick for outputting a value from the
-        node, but only updates the motor's value once every period * dt seconds.
-
-        Time is used for outputting with a specific frequency.
+        node, but only updates the motor's value when the rate limiter allows
+        it.
 
         :param time: The current simulation time
         :type time: float
         :param value: The current value of the motor node
         :type value: floats
         """
-        self.container.update(self, value)
+        if self.rate.ready(time, value[0] != self.last_sent[0]):
+            self.last_sent[...] = value
+            self.container.update(self, value)
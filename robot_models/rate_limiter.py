@@ -0,0 +1,96 @@
+__author__ = 'Petrut Bogdan'
+
+# Transmission policies
+FIXED_RATE = "fixed-rate"
+MAX_RATE = "max-rate"
+ON_CHANGE = "on-change"
+POLICIES = (FIXED_RATE, MAX_RATE, ON_CHANGE)
+
+
+class RateLimiter(object):
+    def __init__(self, period=1, policy=FIXED_RATE, dt=0.001):
+        """
+        Decides on which simulator ticks an I/O node transmits.
+
+        Ticks are counted exactly as ``round(time / dt)``, so the schedule
+        does not drift with floating point error and follows the real time
+        step of the simulator (see :py:meth:`set_dt`).
+
+        :param period: The number of ticks between two transmissions
+        :type period: int > 0
+        :param policy: ``FIXED_RATE`` samples once every period, whether the
+            value changed or not; ``MAX_RATE`` transmits as soon as the value
+            changes but at most once every period; ``ON_CHANGE`` transmits
+            every change
+        :type policy: str
+        :param dt: The time step in seconds
+        :type dt: float
+        """
+        if int(period) < 1:
+            raise ValueError("The period must be at least 1 tick")
+        if policy not in POLICIES:
+            raise ValueError("Unknown transmission policy " + repr(policy))
+        self.period = int(period)
+        self.policy = policy
+        self.dt = dt
+        self.next_tick = 0
+        self.last_tick = None
+
+    def set_dt(self, dt):
+        """
+        Use the time step of the simulator that runs the node.
+
+        :param dt: The time step in seconds
+        :type dt: float
+        """
+        self.dt = dt
+
+    def tick(self, time):
+        """
+        :param time: The current simulation time
+        :type time: float
+        :return: The number of the tick at the given time
+        :rtype: int
+        """
+        return int(round(time / self.dt))
+
+    def due(self, time):
+        """
+        Whether the period allows a transmission at the given time.
+
+        :param time: The current simulation time
+        :type time: float
+        :rtype: bool
+        """
+        return (self.policy == ON_CHANGE or
+                int(round(time / self.dt)) >= self.next_tick)
+
+    def ready(self, time, changed=True):
+        """
+        Whether to transmit at the given time. A positive answer is recorded
+        as a transmission and schedules the next one.
+
+        :param time: The current simulation time
+        :type time: float
+        :param changed: Whether the value changed since it was last
+            transmitted. Ignored by ``FIXED_RATE``.
+        :type changed: bool
+        :rtype: bool
+        """
+        tick = int(round(time / self.dt))
+        if self.policy == ON_CHANGE:
+            transmit = changed
+        elif tick < self.next_tick:
+            transmit = False
+        else:
+            transmit = changed or self.policy == FIXED_RATE
+
+        if transmit:
+            if self.policy == FIXED_RATE and self.last_tick is not None:
+                # Keep the phase of the schedule if ticks were skipped
+                self.next_tick = tick + self.period - (
+                    (tick - self.next_tick) % self.period)
+            else:
+                self.next_tick = tick + self.period
+            self.last_tick = tick
+        return transmit
@@ -1,10 +1,13 @@
 __author__ = 'Petrut Bogdan'
 
 import nengo
+import numpy as np
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE
 
 
 class Sensor(nengo.Node):
-    def __init__(self, container, label=None):
+    def __init__(self, container, label=None, sampling_period=1,
+                 policy=FIXED_RATE, dt=0.001):
         """
         A sensor is a type of node that inputs values into a simulation. It
         could represent the feedback value from a motor.
@@ -13,13 +16,26 @@ class Sensor(nengo.Node):
         :type container: Container
         :param label: The name of the sensor
         :type label: str
+        :param sampling_period: The period with which the node reads a new
+            value from the container, in ticks. The previous value is held in
+            between.
+        :type sampling_period: int
+        :param policy: The sampling policy. See
+            :py:class:`~robot_models.rate_limiter.RateLimiter`.
+        :type policy: str
+        :param dt: The time step in seconds
+        :type dt: float
         :return: A sensor node
         :rtype: Sensor
         """
         self.container = container
-        self.container.add(self, 0.)
         super(Sensor, self).__init__(output=self.sensor_output, size_out=1,
                                      label=label)
+        self.container.add(self, 0.)
+        self.slot = self.container.slot(self)
+        self.rate = RateLimiter(sampling_period, policy, dt)
+        self.sequence = self.slot.sample_sequence
+        self.sample = np.array(self.slot.sample)
 
     def sensor_output(self, time):
         """
@@ -31,5 +47,10 @@ class Sensor(nengo.Node):
         :return: Value of the sensor (as stored in container)
         :rtype: float
         """
-        # TODO Make transmit period be adjustable
-        return self.container[self]
+        self.container.sample(time)
+        sequence = self.slot.sample_sequence
+        if (self.rate.ready(time, sequence != self.sequence) and
+                sequence != self.sequence):
+            self.sequence = sequence
+            self.sample[...] = self.slot.sample
+        return self.sample
@@ -1,54 +1,95 @@
 __author__ = 'Petrut Bogdan'
 
+import collections
+
 import nengo
 import numpy as np
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE
+
+# Value stored in the container by a Servo: which joints changed since the
+# previous update and the positions of all the joints
+ServoUpdate = collections.namedtuple("ServoUpdate", ["mask", "values"])
 
 
 class Servo(nengo.Node):
     def __init__(self, container, size_in=None, label=None,
-                 sampling_period=15):
+                 sampling_period=15, delta=0., hysteresis=.5,
+                 policy=FIXED_RATE, dt=0.001):
         """
         A motor is a type of node that sends live information back for
         processing.
 
+        Only the joints that moved by at least ``delta`` since they were last
+        sent are updated. Once a joint is moving, it keeps being sent as long
+        as it moves by at least ``delta * hysteresis``, so slow movements are
+        not turned into steps.
+
         :param container: The object that receives information from the motor
         :type container: Container
-        :param sampling_period: The period with which the motor sends information
-        :type sampling_period: float or int
-        :param dt: The time step in seconds
-        :type dt: float
+        :param size_in: The number of joints
+        :type size_in: int
+        :param sampling_period: The period with which the motor sends
+            information, in ticks
+        :type sampling_period: int
         :param label: The name of the motor
         :type label: str
+        :param delta: The smallest change of a joint that is sent, either for
+            all joints or per joint
+        :type delta: float or numpy.ndarray
+        :param hysteresis: Fraction of delta below which a moving joint is
+            considered to have stopped
+        :type hysteresis: float
+        :param policy: The transmission policy. See
+            :py:class:`~robot_models.rate_limiter.RateLimiter`.
+        :type policy: str
+        :param dt: The time step in seconds
+        :type dt: float
         :return: A motor node
         :rtype: Servo
         """
         self.container = container
-        self.dt = 0.001
-        self.delta = 0.00
-        self.sampling_period = sampling_period * self.dt
-        self.previous_time = -self.sampling_period
-        self.container.add(self, [0] * size_in)
+        self.rate = RateLimiter(sampling_period, policy, dt)
+        size_in = 1 if not size_in else size_in
+        self.delta = np.zeros(size_in) + delta
+        self.release = self.delta * hysteresis
+
+        self.last_sent = np.zeros(size_in)
+        self.moving = np.zeros(size_in, dtype=bool)
+        self._difference = np.empty(size_in)
+        self._threshold = np.empty(size_in)
+        self._mask = np.empty(size_in, dtype=bool)
+
         super(Servo, self).__init__(output=self.servo_output,
-                                    size_in=1 if not size_in else size_in,
+                                    size_in=size_in, size_out=0,
                                     label=label)
+        self.container.add(self, ServoUpdate(self.moving.copy(),
+                                             self.last_sent.copy()))
 
     def servo_output(self, time, value):
         """
         Function that is called every time tick for outputting a value from the
-        node, but only updates the motor's value once every period * dt seconds.
+        node, but only updates the motor's value when the rate limiter allows
+        it.
 
-        Time is used for outputting with a specific frequency.
+        The container receives a :py:class:`ServoUpdate` with the joints that
+        changed and the last sent position of every joint.
 
         :param time: The current simulation time
         :type time: float
         :param value: The current value of the motor node
         :type value: floats
         """
-        if time - self.previous_time >= self.sampling_period:
-            update_table = np.abs(value - self.container[self]) >= self.delta
-            self.previous_time = time
-            if np.any(update_table):
-                delta_step_value = [
-                    value[i] if update_table[i] else self.container[self][i] for
-                    i in range(value.size)]
-                self.container.update(self, value)
+        if self.rate.due(time):
+            np.subtract(value, self.last_sent, out=self._difference)
+            np.abs(self._difference, out=self._difference)
+            np.copyto(self._threshold, self.delta)
+            np.copyto(self._threshold, self.release, where=self.moving)
+            np.greater_equal(self._difference, self._threshold,
+                             out=self._mask)
+            changed = self._mask.any()
+            if self.rate.ready(time, changed):
+                self.moving[...] = self._mask
+                if changed:
+                    np.copyto(self.last_sent, value, where=self._mask)
+                    self.container.update(self, ServoUpdate(
+                        self._mask.copy(), self.last_sent.copy()))
@@ -0,0 +1,84 @@
+__author__ = 'Petrut Bogdan'
+
+import numpy as np
+
+
+class ServoCalibration(object):
+    def __init__(self, ranges, radius=1., resolution=None, max_position=255):
+        """
+        Maps the values represented for a group of servos to the byte
+        positions their controller accepts.
+
+        Each value is clipped to ``[-radius, radius]`` and linearly mapped onto
+        the range of its joint, then truncated to an integer. Whole servo
+        vectors are converted at once. If a resolution is given, the
+        positions are instead read from a table precomputed for that many
+        evenly spaced values.
+
+        :param ranges: The ``[low, high]`` position of each joint, as a list
+            or a dict from joint index to range
+        :type ranges: list or dict
+        :param radius: The largest magnitude represented for a joint
+        :type radius: float
+        :param resolution: The number of entries per joint of the lookup
+            table. Leave as None to compute every position exactly.
+        :type resolution: int
+        :param max_position: The largest position the controller link can
+            carry, e.g.
+            :py:data:`robot_interface.serial_output.MAX_POSITION`
+        :type max_position: int
+        """
+        if isinstance(ranges, dict):
+            ranges = [ranges[joint] for joint in range(len(ranges))]
+        self.ranges = np.array(ranges, dtype=float).reshape(-1, 2)
+        if np.any(self.ranges < 0) or np.any(self.ranges > max_position):
+            raise ValueError("Servo positions must be between 0 and %d" %
+                             max_position)
+        self.radius = float(radius)
+        self.low = self.ranges[:, 0]
+        self.slope = (self.ranges[:, 1] - self.ranges[:, 0]) / (
+            2 * self.radius)
+        self.resolution = resolution
+
+        self.table = None
+        if resolution is not None:
+            if int(resolution) < 2:
+                raise ValueError("The lookup table needs at least 2 entries")
+            levels = np.linspace(-self.radius, self.radius, int(resolution))
+            # One row per joint
+            self.table = np.array([self._compute(np.repeat(level, self.joints))
+                                   for level in levels]).T.copy()
+            self._table_scale = (int(resolution) - 1) / (2 * self.radius)
+
+    @property
+    def joints(self):
+        """The number of joints calibrated"""
+        return self.ranges.shape[0]
+
+    def _compute(self, values, joints=slice(None)):
+        values = np.clip(values, -self.radius, self.radius)
+        positions = (values + self.radius) * self.slope[joints] + \
+            self.low[joints]
+        return positions.astype(np.uint8)
+
+    def positions(self, values, joints=None):
+        """
+        Convert the values of a group of servos to byte positions.
+
+        :param values: The value of every joint
+        :type values: numpy.ndarray
+        :param joints: The indices of the joints to convert. Defaults to all.
+        :type joints: numpy.ndarray
+        :return: The position of each selected joint
+        :rtype: numpy.ndarray of uint8
+        """
+        values = np.asarray(values, dtype=float)
+        if joints is None:
+            joints = slice(None)
+        else:
+            values = values[joints]
+        if self.table is None:
+            return self._compute(values, joints)
+        levels = np.rint((np.clip(values, -self.radius, self.radius) +
+                          self.radius) * self._table_scale).astype(np.intp)
+        return self.table[np.arange(self.joints)[joints], levels]
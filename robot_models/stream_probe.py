@@ -0,0 +1,146 @@
+__author__ = 'Petrut Bogdan'
+
+import glob
+import os
+
+import nengo
+import numpy as np
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE
+
+# Empty array whose shape gives the width of the rows of a stream
+HEADER = "header.npy"
+# Segments hold rows of float64 without any header, so they can be appended to
+SEGMENT_PATTERN = "%08d.bin"
+
+
+class StreamProbe(nengo.Node):
+    def __init__(self, directory, size_in, label=None, decimation=10,
+                 chunk_size=1000, segment_size=1 << 26, dt=0.001):
+        """
+        A node that records its input to disk with constant memory use, for
+        simulations too long to be probed in memory.
+
+        One sample every ``decimation`` ticks is written into a fixed-size
+        buffer. Every time the buffer fills up it is appended to the current
+        segment in ``directory`` and reused. Once a segment holds
+        ``segment_size`` bytes the next one is started, so a long run leaves
+        a few large segments rather than thousands of small ones. Each row of
+        a segment is the simulation time followed by the sampled values.
+        Segments are only ever appended to, so a stream can be read with
+        :py:func:`load_stream` while it is being recorded.
+
+        :param directory: Where to write the segments. Created if needed.
+        :type directory: str
+        :param size_in: The dimensionality of the input
+        :type size_in: int > 0
+        :param label: The name of the probe
+        :type label: str
+        :param decimation: The number of ticks between two samples
+        :type decimation: int > 0
+        :param chunk_size: The number of samples kept in memory between two
+            writes
+        :type chunk_size: int > 0
+        :param segment_size: The size of a segment in bytes, rounded up to a
+            whole number of chunks
+        :type segment_size: int > 0
+        :param dt: The time step in seconds
+        :type dt: float
+        :return: A stream probe node
+        :rtype: StreamProbe
+        :raises: ValueError if the directory holds a stream of another
+            dimensionality
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        header = os.path.join(directory, HEADER)
+        if os.path.isfile(header):
+            if np.load(header).shape[1] != size_in + 1:
+                raise ValueError("%s holds a stream of another size" %
+                                 directory)
+        else:
+            np.save(header, np.zeros((0, size_in + 1)))
+        self.rate = RateLimiter(decimation, FIXED_RATE, dt)
+        self.buffer = np.zeros((chunk_size, size_in + 1))
+        self.rows = 0
+        self.segment_size = segment_size
+        self.segment_bytes = 0
+        # Continue after the segments of a previous run
+        self.segment = len(segments(directory))
+        super(StreamProbe, self).__init__(output=self.probe_output,
+                                          size_in=size_in, size_out=0,
+                                          label=label)
+
+    def probe_output(self, time, value):
+        """
+        Function that is called every time tick with the probed value.
+
+        :param time: The current simulation time
+        :type time: float
+        :param value: The probed value
+        :type value: numpy.ndarray
+        """
+        if self.rate.ready(time):
+            row = self.buffer[self.rows]
+            row[0] = time
+            row[1:] = value
+            self.rows += 1
+            if self.rows == self.buffer.shape[0]:
+                self.flush()
+
+    def flush(self):
+        """Append the samples recorded since the last write to the current
+        segment."""
+        if not self.rows:
+            return
+        with open(os.path.join(self.directory,
+                               SEGMENT_PATTERN % self.segment), "ab") as out:
+            self.buffer[:self.rows].tofile(out)
+        self.segment_bytes += self.buffer[:self.rows].nbytes
+        self.rows = 0
+        if self.segment_bytes >= self.segment_size:
+            self.segment += 1
+            self.segment_bytes = 0
+
+
+def segments(directory):
+    """
+    :param directory: The directory of a stream probe
+    :type directory: str
+    :return: The paths of the segments in the order they were written
+    :rtype: list
+    """
+    return sorted(glob.glob(os.path.join(directory, "[0-9]*.bin")))
+
+
+def load_stream(directory, mmap=True):
+    """
+    Read back the samples recorded by a :py:class:`StreamProbe`, one segment
+    at a time, so a whole recording never has to fit in memory. A segment
+    that is still being written is read up to its last complete row.
+
+    Example::
+
+        for times, values in load_stream(directory):
+            print(times[-1], values.max(axis=0))
+
+    :param directory: The directory of the stream probe
+    :type directory: str
+    :param mmap: Whether to memory-map the segments instead of reading them
+    :type mmap: bool
+    :return: Generator of the sample times and the sampled values of each
+        segment
+    :rtype: generator of (numpy.ndarray, numpy.ndarray)
+    """
+    width = np.load(os.path.join(directory, HEADER)).shape[1]
+    for path in segments(directory):
+        rows = os.path.getsize(path) // (8 * width)
+        if not rows:
+            continue
+        if mmap:
+            data = np.memmap(path, dtype=np.float64, mode='r',
+                             shape=(rows, width))
+        else:
+            data = np.fromfile(path, dtype=np.float64,
+                               count=rows * width).reshape(rows, width)
+        yield data[:, 0], data[:, 1:]
@@ -2,24 +2,59 @@ __author__ = 'Petrut Bogdan'
 
 import nengo
 from nengo import Network
+from nengo.dists import Choice
 import numpy as np
-from robot_utils.matrix_multiplication import MatrixMultiplication
+from robot_utils.seeding import derive_seed
 
-_matrix = np.eye(3)
-_vector = np.zeros((3, 1))
+# Component k of a x b is a[i] * b[j] - a[j] * b[i], with i = k + 1 and
+# j = k + 2 (mod 3); these are the six terms, as (a index, b index, sign,
+# output index)
+_terms = [((k + 1) % 3, (k + 2) % 3, 1, k) for k in range(3)] + \
+         [((k + 2) % 3, (k + 1) % 3, -1, k) for k in range(3)]
+
+
+def skew(vector):
+    """
+    The matrix that computes the cross product with a vector, i.e.
+    ``numpy.dot(skew(a), b) == numpy.cross(a, b)``.
+
+    :param vector: A 3 dimensional vector
+    :type vector: numpy.ndarray
+    :return: The 3x3 skew-symmetric matrix of the vector
+    :rtype: numpy.ndarray
+    """
+    x, y, z = np.ravel(vector)
+    return np.array([[0., -z, y],
+                     [z, 0., -x],
+                     [-y, x, 0.]])
+
+
+def product(x):
+    return x[0] * x[1]
 
 
 class CrossProduct(Network):
-    def __init__(self, n_neurons=100, radius=1.0,
-                 label=None, seed=None,
+    def __init__(self, n_neurons=100, radius=1.0, vector_A=None,
+                 vector_B=None, label=None, seed=None,
                  add_to_container=None):
         """
         Cross product between two 3x1 vectors.
 
+        Only the six non-zero terms of the cross product are computed, each
+        by a 2D product ensemble. If one of the vectors is constant, pass it
+        as ``vector_A`` or ``vector_B``: the cross product is then linear in
+        the other vector, which is represented in 3 ensembles and decoded
+        through the skew-symmetric matrix of the constant, and the network
+        has no input for the constant vector.
+
         :param n_neurons: The number of neurons.
         :type n_neurons: int defaults to 100
         :param radius: The range of values that can be represented
         :type radius: float
+        :param vector_A: The first vector, if it is constant
+        :type vector_A: numpy.ndarray
+        :param vector_B: The second vector, if it is constant
+        :type vector_B: numpy.ndarray
         :param label: Name of the model. Defaults to None.
         :type label: str
         :param seed: Random number seed that will be fed to the random
@@ -37,26 +72,44 @@ class CrossProduct(Network):
         self.n_neurons = n_neurons
         self.radius = radius
 
-        with self:
-            self.in_A = nengo.Node(size_in=_vector.size)
-            self.in_B = nengo.Node(size_in=_vector.size)
-
-            self.multiplier = MatrixMultiplication(n_neurons=self.n_neurons,
-                                                   matrix_A=_matrix,
-                                                   matrix_B=_vector,
-                                                   radius=self.radius)
+        if vector_A is not None and vector_B is not None:
+            raise ValueError("At most one of the vectors can be constant")
 
-            nengo.Connection(self.in_A[0], self.multiplier.in_A[[0, 4, 8]],
-                             transform=[[0]] * 3)
-            nengo.Connection(self.in_A[0], self.multiplier.in_A[[7, 5]],
-                             transform=[[1], [-1]])
-            nengo.Connection(self.in_A[1], self.multiplier.in_A[[2, 6]],
-                             transform=[[1], [-1]])
-            nengo.Connection(self.in_A[2], self.multiplier.in_A[[3, 1]],
-                             transform=[[1], [-1]])
+        with self:
+            self.output = nengo.Node(size_in=3)
 
-            nengo.Connection(self.in_B, self.multiplier.in_B)
+            if vector_A is not None or vector_B is not None:
+                # a x b = skew(a) . b = -skew(b) . a
+                transform = skew(vector_A) if vector_A is not None else \
+                    -skew(vector_B)
+                self.multiplier = None
+                self.vector = nengo.networks.EnsembleArray(
+                    self.n_neurons, 3, radius=self.radius,
+                    seed=derive_seed(seed, 'vector'))
+                if vector_A is not None:
+                    self.in_B = self.vector.input
+                else:
+                    self.in_A = self.vector.input
+                nengo.Connection(self.vector.output, self.output,
+                                 transform=transform)
+            else:
+                self.in_A = nengo.Node(size_in=3)
+                self.in_B = nengo.Node(size_in=3)
+                a_index, b_index, signs, k = [np.array(column) for column in
+                                              zip(*_terms)]
 
-            self.output = nengo.Node(size_in=_vector.size)
+                self.multiplier = nengo.networks.EnsembleArray(
+                    self.n_neurons, n_ensembles=len(_terms),
+                    ens_dimensions=2, radius=1.5 * self.radius,
+                    encoders=Choice([[1, 1], [-1, 1], [1, -1], [-1, -1]]),
+                    seed=derive_seed(seed, 'multiplier'))
+                pairs = np.arange(len(_terms)) * 2
+                nengo.Connection(self.in_A[list(a_index)],
+                                 self.multiplier.input[list(pairs)])
+                nengo.Connection(self.in_B[list(b_index)],
+                                 self.multiplier.input[list(pairs + 1)])
 
-            nengo.Connection(self.multiplier.output, self.output)
+                prod = self.multiplier.add_output("product", product)
+                transform = np.zeros((3, len(_terms)))
+                transform[k, np.arange(len(_terms))] = signs
+                nengo.Connection(prod, self.output, transform=transform)
@@ -3,6 +3,7 @@ __author__ = 'Petrut Bogdan'
 import nengo
 from nengo import Network
 import numpy as np
+from robot_utils.seeding import derive_seed
 
 
 class DotProduct(Network):
@@ -44,18 +45,107 @@ class DotProduct(Network):
             self.in_B = nengo.Node(size_in=self.dimensions)
             # Ensemble to multiply each respective dimension
             self.multiplier = nengo.networks.EnsembleArray(n_neurons=2 * self.n_neurons, n_ensembles=self.dimensions,
-                                                           ens_dimensions=2)
+                                                           ens_dimensions=2,
+                                                           seed=derive_seed(seed, 'multiplier'))
             nengo.Connection(self.in_A, self.multiplier.input[[np.arange(self.dimensions) * 2]])
             nengo.Connection(self.in_B, self.multiplier.input[[np.arange(self.dimensions) * 2 + 1]])
             prod = self.multiplier.add_output("product", product)
             # Add all of the products together to give the final value (if normalised input is provided then the output
             # is the cosine between the two vectors)
-            self.adder = nengo.Ensemble(n_neurons=self.n_neurons, dimensions=1)
+            self.adder = nengo.Ensemble(n_neurons=self.n_neurons, dimensions=1,
+                                        seed=derive_seed(seed, 'adder'))
             nengo.Connection(prod, self.adder, transform=[[1]* prod.size_out])
             # Output from the network
             self.output = nengo.Node(size_in=1)
             nengo.Connection(self.adder, self.output)
 
 
+class BatchedDotProduct(Network):
+    def __init__(self, n_neurons=100, radius=1.0, dimensions=2,
+                 n_products=1, vectors=None, label=None, seed=None,
+                 add_to_container=None):
+        """
+        K dot products of a shared N dimensional vector with K other vectors,
+        computed by a single ensemble array with one adder per product.
+
+        If the K vectors are constant, pass them as ``vectors``: the dot
+        products are then linear in the shared vector and are folded into the
+        transform feeding the adders, so no product ensembles are built and
+        there is no ``in_B``.
+
+        :param n_neurons: The number of neurons.
+        :type n_neurons: int defaults to 100
+        :param radius: The range of values that can be represented
+        :type radius: float
+        :param dimensions: The number of dimensions in each vector.
+        :type dimensions: int defaults to 2
+        :param n_products: The number of dot products (K). Ignored if
+            vectors is given.
+        :type n_products: int
+        :param vectors: The constant vectors to multiply with, one per row.
+        :type vectors: numpy.ndarray
+        :param label: Name of the model. Defaults to None.
+        :type label: str
+        :param seed: Random number seed that will be fed to the random
+            number generator. Setting this seed makes the creation of the
+            model a deterministic process; however, each new ensemble
+            in the network advances the random number generator, so if
+            the network creation code changes, the entire model changes.
+        :type seed: int
+        :param add_to_container: Determines if this Network will be added to
+            the current container. Defaults to true iff currently with a Network
+        :type add_to_container: bool
+        """
+        super(BatchedDotProduct, self).__init__(label, seed, add_to_container)
+        self.n_neurons = n_neurons
+        self.radius = radius
+        self.dimensions = dimensions
+        self.vectors = None if vectors is None else np.array(
+            vectors, dtype=float).reshape(-1, dimensions)
+        self.n_products = n_products if vectors is None else \
+            self.vectors.shape[0]
+
+        def product(x):
+            return x[0] * x[1]
+
+        with self:
+            # The shared vector
+            self.in_A = nengo.Node(size_in=self.dimensions)
+            # One adder per dot product
+            self.adder = nengo.networks.EnsembleArray(
+                n_neurons=self.n_neurons, n_ensembles=self.n_products,
+                radius=self.radius, seed=derive_seed(seed, 'adder'))
+
+            if self.vectors is not None:
+                self.multiplier = None
+                nengo.Connection(self.in_A, self.adder.input,
+                                 transform=self.vectors)
+            else:
+                # The K vectors, one after the other
+                self.in_B = nengo.Node(
+                    size_in=self.n_products * self.dimensions)
+                # Ensemble to multiply each respective dimension of each pair
+                pairs = self.n_products * self.dimensions
+                self.multiplier = nengo.networks.EnsembleArray(
+                    n_neurons=2 * self.n_neurons, n_ensembles=pairs,
+                    ens_dimensions=2, radius=self.radius,
+                    seed=derive_seed(seed, 'multiplier'))
+                nengo.Connection(
+                    self.in_A,
+                    self.multiplier.input[list(np.arange(pairs) * 2)],
+                    transform=np.tile(np.eye(self.dimensions),
+                                      (self.n_products, 1)))
+                nengo.Connection(
+                    self.in_B,
+                    self.multiplier.input[list(np.arange(pairs) * 2 + 1)])
+                prod = self.multiplier.add_output("product", product)
+                # Each adder sums the products of its own pair of vectors
+                nengo.Connection(prod, self.adder.input, transform=np.kron(
+                    np.eye(self.n_products), np.ones(self.dimensions)))
+            # Output from the network
+            self.output = nengo.Node(size_in=self.n_products)
+            nengo.Connection(self.adder.output, self.output)
+
+
 if __name__ == "__main__":
     dp = DotProduct()
@@ -3,16 +3,73 @@ __author__ = 'Petrut Bogdan'
 import nengo
 import numpy as np
 from nengo.dists import Choice
+from robot_utils.seeding import derive_seed
 
 
 def product(x):
     return x[0] * x[1]
 
 
+def multiplication_indices(shape_A, shape_B):
+    """
+    Where the transforms of a :py:class:`MatrixMultiplication` are non-zero.
+    Each of them only holds ones, at most one per row, so it is fully
+    described by the row and column of each one.
+
+    The pair of ensembles multiplying ``A[i, j]`` by ``B[j, k]`` is number
+    ``j + k * A.cols + i * B.size``; the product is added to element
+    ``[i, k]`` of the result.
+
+    :param shape_A: The shape of the first matrix
+    :type shape_A: tuple
+    :param shape_B: The shape of the second matrix
+    :type shape_B: tuple
+    :return: (rows, columns) index arrays of the ones of transform_a
+        (A -> pairs), transform_b (B -> pairs) and transform_c
+        (products -> result)
+    :rtype: tuple
+    """
+    a_rows, a_cols = shape_A
+    b_cols = shape_B[1]
+    i, j, k = [index.ravel() for index in
+               np.indices((a_rows, a_cols, b_cols))]
+    pair = j + k * a_cols + i * a_cols * b_cols
+    products = np.arange(a_rows * a_cols * b_cols)
+    return ((2 * pair, j + i * a_cols),
+            (2 * pair + 1, k + j * b_cols),
+            (products // a_cols, products))
+
+
+def multiplication_transforms(shape_A, shape_B):
+    """
+    The dense transforms of a :py:class:`MatrixMultiplication`. See
+    :py:func:`multiplication_indices`.
+
+    :param shape_A: The shape of the first matrix
+    :type shape_A: tuple
+    :param shape_B: The shape of the second matrix
+    :type shape_B: tuple
+    :return: transform_a, transform_b and transform_c
+    :rtype: tuple
+    """
+    a_size = shape_A[0] * shape_A[1]
+    b_size = shape_B[0] * shape_B[1]
+    pairs = a_size * shape_B[1]
+    shapes = [(2 * pairs, a_size), (2 * pairs, b_size),
+              (shape_A[0] * shape_B[1], pairs)]
+    transforms = []
+    for shape, (rows, cols) in zip(
+            shapes, multiplication_indices(shape_A, shape_B)):
+        transform = np.zeros(shape)
+        transform[rows, cols] = 1
+        transforms.append(transform)
+    return tuple(transforms)
+
+
 class MatrixMultiplication(nengo.Network):
     def __init__(self, n_neurons=100, matrix_A=np.eye(3), matrix_B=np.zeros((3, 1)),
                  radius=1.0, label=None, seed=None,
-                 add_to_container=None):
+                 add_to_container=None, sparse=False):
 
         """
         A network that does matrix multiplication based on two previously
@@ -43,6 +100,11 @@ class MatrixMultiplication(nengo.Network):
         :param add_to_container: Determines if this Network will be added to
             the current container. Defaults to true iff currently with a Network
         :type add_to_container: bool
+        :param sparse: Route each value with an indexed connection instead of
+            a dense transform, so the size of the connections grows with the
+            number of products rather than with its square. Computes the same
+            values.
+        :type sparse: bool
         """
         super(MatrixMultiplication, self).__init__(label, seed,
                                                    add_to_container)
@@ -50,6 +112,7 @@ class MatrixMultiplication(nengo.Network):
         self.radius = radius
         self.matrix_A = matrix_A
         self.matrix_B = matrix_B
+        self.sparse = sparse
 
         if self.matrix_A.shape[1] != self.matrix_B.shape[0]:
             raise ArithmeticError("Matrix dimensions must agree")
@@ -58,8 +121,10 @@ class MatrixMultiplication(nengo.Network):
             self.in_A = nengo.Node(size_in=matrix_A.size)
             self.in_B = nengo.Node(size_in=matrix_B.size)
 
-            self.A = nengo.networks.EnsembleArray(self.n_neurons, matrix_A.size)
-            self.B = nengo.networks.EnsembleArray(self.n_neurons, matrix_B.size)
+            self.A = nengo.networks.EnsembleArray(self.n_neurons, matrix_A.size,
+                                                  seed=derive_seed(seed, 'A'))
+            self.B = nengo.networks.EnsembleArray(self.n_neurons, matrix_B.size,
+                                                  seed=derive_seed(seed, 'B'))
 
             nengo.Connection(self.in_A, self.A.input)
             nengo.Connection(self.in_B, self.B.input)
@@ -69,36 +134,42 @@ class MatrixMultiplication(nengo.Network):
                 n_ensembles=self.matrix_A.size * self.matrix_B.shape[1],
                 ens_dimensions=2,
                 radius=1.5 * radius,
-                encoders=Choice([[1, 1], [-1, 1], [1, -1], [-1, -1]]))
+                encoders=Choice([[1, 1], [-1, 1], [1, -1], [-1, -1]]),
+                seed=derive_seed(seed, 'C'))
 
-        transform_a = np.zeros((self.C.dimensions, self.matrix_A.size))
-        transform_b = np.zeros((self.C.dimensions, self.matrix_B.size))
-
-        for i in range(self.matrix_A.shape[0]):
-            for j in range(self.matrix_A.shape[1]):
-                for k in range(self.matrix_B.shape[1]):
-                    tmp = (
-                        j + k * self.matrix_A.shape[1] + i * self.matrix_B.size)
-                    transform_a[tmp * 2][j + i * self.matrix_A.shape[1]] = 1
-                    transform_b[tmp * 2 + 1][k + j * self.matrix_B.shape[1]] = 1
+        indices = multiplication_indices(self.matrix_A.shape,
+                                         self.matrix_B.shape)
+        if not sparse:
+            transform_a, transform_b, transform_c = multiplication_transforms(
+                self.matrix_A.shape, self.matrix_B.shape)
 
         with self:
-            nengo.Connection(self.A.output, self.C.input, transform=transform_a)
-            nengo.Connection(self.B.output, self.C.input, transform=transform_b)
+            if sparse:
+                for source, (rows, cols) in zip([self.A, self.B], indices[:2]):
+                    nengo.Connection(source.output[list(cols)],
+                                     self.C.input[list(rows)])
+            else:
+                nengo.Connection(self.A.output, self.C.input, transform=transform_a)
+                nengo.Connection(self.B.output, self.C.input, transform=transform_b)
 
             self.D = nengo.networks.EnsembleArray(
                 self.n_neurons,
                 n_ensembles=self.matrix_A.shape[0] * self.matrix_B.shape[1],
-                radius=radius)
-
-        transform_c = np.zeros((self.D.dimensions,
-                                self.matrix_A.size * self.matrix_B.shape[1]))
-        for i in range(self.matrix_A.size * self.matrix_B.shape[1]):
-            transform_c[i // self.matrix_B.shape[0]][i] = 1
+                radius=radius,
+                seed=derive_seed(seed, 'D'))
 
         with self:
             prod = self.C.add_output("product", product)
-            nengo.Connection(prod, self.D.input, transform=transform_c)
+            if sparse:
+                # Product number p is added to element p // A.cols of D, so
+                # one connection per column of A sums the products
+                rows, cols = indices[2]
+                step = self.matrix_A.shape[1]
+                for column in range(step):
+                    nengo.Connection(prod[list(cols[column::step])],
+                                     self.D.input[list(rows[column::step])])
+            else:
+                nengo.Connection(prod, self.D.input, transform=transform_c)
 
             self.output = nengo.Node(size_in=self.D.dimensions)
             nengo.Connection(self.D.output, self.output)
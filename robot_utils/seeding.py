@@ -0,0 +1,28 @@
+__author__ = 'Petrut Bogdan'
+
+import zlib
+
+# Seeds are kept positive and within the range of a 32 bit integer
+MAX_SEED = 2 ** 31 - 1
+
+
+def derive_seed(seed, *names):
+    """
+    Seed of a part of a seeded network (a sub-network or an ensemble),
+    derived from the seed of the network and the name of the part.
+
+    Unlike the seeds Nengo hands out in creation order, a derived seed does
+    not change when other parts are added to or removed from the network, so
+    the same configuration always builds the same decoders.
+
+    :param seed: The seed of the network, or None if it is not seeded
+    :type seed: int
+    :param names: The name of the part, e.g. ``("left", "error")``
+    :type names: str
+    :return: The seed of the part, or None if the network is not seeded
+    :rtype: int
+    """
+    if seed is None:
+        return None
+    key = "/".join(str(part) for part in (int(seed),) + names)
+    return zlib.crc32(key) & MAX_SEED
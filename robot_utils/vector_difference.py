@@ -2,6 +2,7 @@ __author__ = 'Petrut Bogdan'
 
 import nengo
 from nengo import Network
+from robot_utils.seeding import derive_seed
 
 
 class VectorDifference(Network):
@@ -45,18 +46,18 @@ class VectorDifference(Network):
 
             self.A = nengo.networks.EnsembleArray(
                 n_neurons=self.n_neurons, n_ensembles=self.dimensions,
-                radius=radius)
+                radius=radius, seed=derive_seed(seed, 'A'))
 
             self.B = nengo.networks.EnsembleArray(
                 n_neurons=self.n_neurons, n_ensembles=self.dimensions,
-                radius=radius)
+                radius=radius, seed=derive_seed(seed, 'B'))
 
             nengo.Connection(self.in_A, self.A.input)
             nengo.Connection(self.in_B, self.B.input)
 
             self.S = nengo.networks.EnsembleArray(
                 n_neurons=self.n_neurons, n_ensembles=self.dimensions,
-                radius=2 * self.radius)
+                radius=2 * self.radius, seed=derive_seed(seed, 'S'))
 
             nengo.Connection(self.A.output, self.S.input,
                              transform=[1.] * self.dimensions)
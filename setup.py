@@ -14,7 +14,10 @@ setup(
                         'https://github.com/pabogdan/nengo_spinnaker/tarball/master#egg=nengo-spinnaker-0.2.4'],
 
     install_requires=["nengo==2.1.0.dev0", "rig>=0.5.3, <1.0.0",
-                      "bitarray>=0.8.1, <1.0.0", "nengo-spinnaker==0.2.4"],
+                      "bitarray>=0.8.1, <1.0.0", "nengo-spinnaker==0.2.4",
+                      # Serial ports are opened by number, which pyserial 3
+                      # no longer supports
+                      "pyserial>=2.6, <3.0"],
     classifiers=[
         "Operating System :: POSIX :: Linux",
         "Operating System :: Microsoft :: Windows",
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of the handling of Furhat events: framing and parsing of the
+sample traffic in data/furhat_traffic.txt, against the split based parsing
+furhatClass used to do. Run from the root of the repository with
+
+    python -m unittests.benchmark_furhat_events
+"""
+__author__ = 'Petrut Bogdan'
+
+import os
+import timeit
+
+from robot_interface.furhat_client import EventFramer, EVENT
+from robot_interface.furhat_events import parse_event
+
+TRAFFIC = os.path.join(os.path.dirname(__file__), "data",
+                       "furhat_traffic.txt")
+
+
+def split_parse(payload):
+    # The parsing furhatClass used to do, kept for comparison
+    agent = display = None
+    for i in payload.split(","):
+        b = i.split(":")
+        b[0] = b[0][1:-1]
+        if b[0] == "agent":
+            agent = b[1][1:-1]
+        if b[0] == "display":
+            display = b[1][1:-1]
+    return agent, display
+
+
+def main(repeat=5, number=20):
+    with open(TRAFFIC, "rb") as traffic:
+        data = traffic.read()
+    events = [message for message in EventFramer().feed(data)
+              if message.command == EVENT]
+
+    def frame():
+        EventFramer().feed(data)
+
+    def parse():
+        for message in events:
+            parse_event(message)
+
+    def split():
+        for message in events:
+            split_parse(message.payload)
+
+    parsed = [parse_event(message) for message in events]
+    print "%d events, %d malformed" % (len(events),
+                                       parsed.count(None))
+    for name, function in [("framing", frame), ("parsing", parse),
+                           ("split parsing", split)]:
+        best = min(timeit.repeat(function, repeat=repeat, number=number))
+        print "%-14s %6.2f us per event" % (
+            name, 1e6 * best / number / len(events))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface import backends
+from robot_interface.alan_robot import AlanRobot
+import nengo
+import numpy as np
+
+
+class TestBackends(TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            backends.simulator_factory("quantum")
+
+    def test_direct_mode_keeps_neurons_when_needed(self):
+        with nengo.Network() as network:
+            a = nengo.Ensemble(10, 1)
+            b = nengo.Ensemble(10, 1)
+            c = nengo.Ensemble(10, 1)
+            nengo.Connection(a, b)
+            nengo.Connection(a, c.neurons, transform=[[-1]] * 10)
+
+        self.assertEqual(2, backends.set_direct_mode(network))
+        self.assertIsInstance(a.neuron_type, nengo.Direct)
+        self.assertIsInstance(b.neuron_type, nengo.Direct)
+        self.assertNotIsInstance(c.neuron_type, nengo.Direct)
+
+    def test_alan_robot_on_direct_backend(self):
+        robot = AlanRobot(run_time=.05, backend=backends.DIRECT)
+        simulator = robot.simulation_control.simulator
+        self.assertIsInstance(simulator, nengo.Simulator)
+
+        robot.silence()
+        robot.start_simulation()
+        robot.simulation_control.join(10.)
+        self.assertEqual(50, simulator.n_steps)
+        self.assertEqual([0, 1, 0], list(robot.controls[robot.action]))
+        self.assertTrue(np.all(np.isfinite(
+            robot.servos[robot.robot.left_servos].values)))
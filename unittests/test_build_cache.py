@@ -0,0 +1,83 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_control.build_cache import BuildCache, CachedSolver
+from robot_interface import backends
+import nengo
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+def network(seed=1, n_neurons=50, neuron_type=nengo.LIF()):
+    with nengo.Network(seed=seed) as net:
+        net.config[nengo.Ensemble].neuron_type = neuron_type
+        net.stimulus = nengo.Node(lambda t: np.sin(10 * t))
+        net.a = nengo.Ensemble(n_neurons, 1)
+        net.b = nengo.Ensemble(n_neurons, 1)
+        nengo.Connection(net.stimulus, net.a)
+        nengo.Connection(net.a, net.b, function=np.square)
+        net.probe = nengo.Probe(net.b, synapse=0.01)
+    return net
+
+
+class TestBuildCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = BuildCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_network(self, net):
+        hit = self.cache.attach(net, gain=1.)
+        with nengo.Simulator(net) as simulator:
+            if not hit:
+                self.cache.save(net, simulator.model, gain=1.)
+            simulator.run(.1, progress_bar=False)
+            return hit, simulator.data[net.probe]
+
+    def test_rebuild_from_cache_is_identical(self):
+        first = network()
+        hit, data = self.run_network(first)
+        self.assertFalse(hit)
+
+        second = network()
+        hit, cached_data = self.run_network(second)
+        self.assertTrue(hit)
+        self.assertTrue(np.array_equal(data, cached_data))
+        self.assertIsInstance(second.all_connections[1].solver, CachedSolver)
+        self.assertTrue(np.array_equal(first.all_connections[1].solver.solved,
+                                       second.all_connections[1].solver.solved))
+
+    def test_key(self):
+        key = self.cache.key(network(), gain=1.)
+        self.assertEqual(key, self.cache.key(network(), gain=1.))
+        self.assertNotEqual(key, self.cache.key(network(), gain=2.))
+        self.assertNotEqual(key, self.cache.key(network(seed=2), gain=1.))
+        self.assertNotEqual(key, self.cache.key(network(n_neurons=60),
+                                                gain=1.))
+
+    def test_direct_mode_is_not_cached(self):
+        for _ in range(2):
+            hit, _ = self.run_network(network(neuron_type=nengo.Direct()))
+            self.assertFalse(hit)
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_direct_backend_is_not_cached(self):
+        # The direct backend switches the ensembles to direct mode after the
+        # cache is attached, keeping the ones with neuron connections
+        for _ in range(2):
+            net = network()
+            with net:
+                nengo.Connection(net.stimulus, net.b.neurons,
+                                 transform=[[-1]] * 50)
+            self.assertFalse(self.cache.attach(net, gain=1.))
+            simulator = backends.direct_simulator(net)
+            self.assertFalse(self.cache.save(net, simulator.model, gain=1.))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_unseeded(self):
+        with self.assertRaises(ValueError):
+            self.cache.attach(network(seed=None))
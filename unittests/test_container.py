@@ -1,8 +1,18 @@
 __author__ = 'Petrut Bogdan'
 
 from unittest import TestCase
-from robot_interface.container import Container, ContainerThread
+from robot_interface.container import Container, ContainerThread, \
+    ArrayContainer, DispatchQueue, ValueSlot, DROP_OLDEST, COALESCE, BLOCK
+from robot_models.control_signal import ControlSignal
 from time import sleep
+import threading
+import nengo
+import numpy as np
+
+
+class Labelled(object):
+    def __init__(self, label):
+        self.label = label
 
 
 class TestContainer(TestCase):
@@ -97,3 +107,370 @@ class TestContainer(TestCase):
         for key in to_add.iterkeys():
             self.assertEqual(to_add[key], self.container[key],
                              str(to_add[key]) + " not in values")
+
+    def test_overflow_policy_check(self):
+        with self.assertRaises(ValueError):
+            self.container = Container(overflow="sometimes")
+
+    def test_update_order_per_key(self):
+        out = []
+        self.container = Container(default_callback=lambda x, y: out.append(
+            (x, y)), workers=3, queue_size=1000)
+        for value in range(200):
+            for key in range(4):
+                self.container.update(key=key, value=value)
+        self.container.shutdown()
+
+        for key in range(4):
+            self.assertEqual(range(200), [y for x, y in out if x == key])
+        stats = self.container.stats
+        self.assertEqual(800, stats['queued'])
+        self.assertEqual(800, stats['dispatched'])
+        self.assertEqual(0, stats['dropped'])
+
+    def test_coalescing_per_key(self):
+        out = []
+        release = threading.Event()
+
+        def callback(key, value):
+            release.wait(1.)
+            out.append((key, value))
+
+        self.container = Container(default_callback=callback, workers=1)
+        self.container.set_coalescing(0)
+        for value in range(10):
+            self.container.update(key=0, value=value)
+            self.container.update(key=1, value=value)
+        release.set()
+        self.container.shutdown()
+
+        self.assertEqual(range(10), [y for x, y in out if x == 1])
+        self.assertEqual(9, [y for x, y in out if x == 0][-1])
+        self.assertLessEqual(len([y for x, y in out if x == 0]), 2)
+
+    def test_thread_runs_callbacks(self):
+        out = []
+        self.container = Container(
+            default_callback=lambda x, y: out.append(
+                threading.current_thread()))
+        self.container_thread = ContainerThread(self.container)
+        self.container_thread.start()
+        for value in range(10):
+            self.container.update(key=value, value=value)
+        self.container_thread.stop()
+        self.container_thread.join(1.)
+
+        self.assertFalse(self.container_thread.is_alive())
+        self.assertEqual([self.container_thread] * 10, out)
+
+    def test_stats_survive_bind(self):
+        gate = threading.Event()
+        self.container = Container(default_callback=lambda x, y: gate.wait(),
+                                   workers=1, queue_size=2)
+        for value in range(5):
+            self.container.update(key=0, value=value)
+        gate.set()
+        self.container_thread = ContainerThread(self.container)
+        self.container_thread.start()
+        self.container.update(key=0, value=5)
+        self.container_thread.stop()
+        self.container_thread.join(1.)
+
+        stats = self.container.stats
+        self.assertEqual(6, stats['queued'])
+        self.assertEqual(stats['queued'],
+                         stats['dispatched'] + stats['dropped'])
+        self.assertGreater(stats['dropped'], 0)
+
+    def test_updates_after_shutdown_are_dropped(self):
+        self.container = Container(default_callback=lambda x, y: None)
+        self.container.update(key=0, value=0)
+        self.container.shutdown()
+        self.container.update(key=0, value=1)
+        self.container.update_many([0, 1], [2, 3])
+        stats = self.container.stats
+        self.assertEqual(1, stats['dispatched'])
+        self.assertEqual(3, stats['dropped'])
+
+    def test_thread_idle(self):
+        self.container = Container(default_callback=lambda x, y: None)
+        self.container_thread = ContainerThread(self.container)
+        self.container_thread.start()
+        self.container_thread.stop()
+        self.container_thread.join(1.)
+        self.assertFalse(self.container_thread.is_alive())
+
+    def test_key_with_label(self):
+        self.container = Container()
+        keys = [Labelled("a"), Labelled("b"), Labelled(None)]
+        for key in keys:
+            self.container.add(key=key, value=0)
+        self.assertIs(keys[1], self.container.key_with_label("b"))
+        self.assertIsNone(self.container.key_with_label("c"))
+        self.assertEqual(["a", "b"], sorted(self.container.labels))
+        # Adding the same key twice is fine, another key with its label is not
+        self.container.add(key=keys[0], value=1)
+        with self.assertRaises(ValueError):
+            self.container.add(key=Labelled("a"), value=0)
+
+    def test_batch(self):
+        out = []
+        self.container = Container(
+            default_callback=lambda x, y: out.append((x, y)))
+        for key in range(3):
+            self.container.add(key=key, value=0)
+        slot = self.container.slot(0)
+        with self.container.batch():
+            self.container.update(key=0, value=1)
+            with self.container.batch():
+                self.container.update(key=1, value=1)
+            self.container.update(key=0, value=2)
+            self.assertEqual(0, self.container[0])
+            self.assertEqual(0, self.container[1])
+            self.assertEqual(0, slot.sequence)
+        self.container.shutdown()
+
+        self.assertEqual(2, self.container[0])
+        self.assertEqual(1, self.container[1])
+        self.assertEqual(2, slot.sequence)
+        self.assertEqual([(0, 2), (1, 1)], sorted(out))
+
+    def test_batch_is_seen_in_one_tick(self):
+        self.container = Container()
+        with nengo.Network():
+            first = ControlSignal(self.container, 2, label="first")
+            second = ControlSignal(self.container, 3, label="second")
+        self.assertEqual([0, 0], list(first.control_signal_output(.001)))
+        # Committed between the reads of the two nodes in the same tick
+        self.container.update_many([first, second], [np.ones(2), np.ones(3)])
+        self.assertEqual([0, 0, 0], list(second.control_signal_output(.001)))
+        self.assertEqual([1, 1], list(first.control_signal_output(.002)))
+        self.assertEqual([1, 1, 1], list(second.control_signal_output(.002)))
+        self.assertEqual(self.container.generation % 2, 0)
+
+    def test_batch_interleaved_with_reads(self):
+        self.container = Container()
+        with nengo.Network():
+            signals = [ControlSignal(self.container, 50, label=str(index))
+                       for index in range(3)]
+        done = threading.Event()
+
+        def writer():
+            for value in range(1, 1000):
+                self.container.update_many(
+                    signals, [np.ones(50) * value] * len(signals))
+            done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time = 0.
+        while not done.is_set():
+            time += .001
+            values = np.concatenate([signal.control_signal_output(time)
+                                     for signal in signals])
+            self.assertTrue(np.all(values == values[0]))
+        thread.join()
+
+    def test_batch_with_wrong_shape(self):
+        self.container = Container()
+        self.container.add(key=0, value=np.zeros(2))
+        self.container.add(key=1, value=np.zeros(3))
+        first, second = self.container.slot(0), self.container.slot(1)
+        with self.assertRaises(ValueError):
+            self.container.update_many([0, 1], [np.ones(2), np.ones(4)])
+        self.assertEqual((0, 0), (first.sequence, second.sequence))
+        self.assertEqual(0, self.container.generation)
+        self.assertEqual([0, 0], list(self.container[0]))
+        self.container.update_many([0, 1], [np.ones(2), np.ones(3)])
+        self.assertEqual([1, 1, 1], list(second.read_into(np.empty(3))))
+
+    def test_batch_discarded_on_error(self):
+        self.container = Container()
+        self.container.add(key=0, value=0)
+        with self.assertRaises(KeyError):
+            with self.container.batch():
+                self.container.update(key=0, value=1)
+                raise KeyError()
+        self.assertEqual(0, self.container[0])
+        self.container.update(key=0, value=2)
+        self.assertEqual(2, self.container[0])
+
+    def test_update_many(self):
+        self.container = Container()
+        self.container.update_many([0, 1], [3, 4])
+        self.assertEqual(3, self.container[0])
+        self.assertEqual(4, self.container[1])
+
+    def test_slot(self):
+        self.container = Container()
+        self.container.add(key=0, value=np.zeros(3))
+        slot = self.container.slot(0)
+        self.assertIs(slot, self.container.slot(0))
+        self.container.update(key=0, value=np.asarray([1., 2., 3.]))
+        self.assertEqual([1, 2, 3], list(slot.read()))
+        self.assertIs(slot.read(), self.container[0])
+
+
+class TestValueSlot(TestCase):
+    def test_write_swaps_buffers(self):
+        slot = ValueSlot([0., 0.])
+        front = slot.read()
+        slot.write([1., 2.])
+        self.assertEqual([0, 0], list(front))
+        self.assertEqual([1, 2], list(slot.read()))
+        self.assertEqual(2, slot.sequence)
+
+    def test_read_into(self):
+        slot = ValueSlot(np.zeros(4))
+        slot.write(np.arange(4))
+        out = np.empty(4)
+        self.assertIs(out, slot.read_into(out))
+        self.assertEqual([0, 1, 2, 3], list(out))
+
+    def test_failed_write(self):
+        slot = ValueSlot(np.zeros(3))
+        with self.assertRaises(ValueError):
+            slot.write(np.zeros(4))
+        self.assertEqual(0, slot.sequence)
+        slot.write(np.ones(3))
+        self.assertEqual(2, slot.sequence)
+        self.assertEqual([1, 1, 1], list(slot.read_into(np.empty(3))))
+
+    def test_concurrent_writes_are_never_torn(self):
+        slot = ValueSlot(np.zeros(50))
+        done = threading.Event()
+
+        def writer():
+            for value in range(2000):
+                slot.write(np.ones(50) * value)
+            done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        out = np.empty(50)
+        while not done.is_set():
+            slot.read_into(out)
+            self.assertTrue(np.all(out == out[0]))
+        thread.join()
+
+
+class TestArrayContainer(TestCase):
+    def setUp(self):
+        self.container = ArrayContainer()
+        self.container.add("a", [1, 2, 3])
+        self.container.add("b", 4.)
+        self.container.add("c", np.zeros(2))
+
+    def test_add(self):
+        self.assertEqual([1, 2, 3, 4, 0, 0],
+                         list(self.container.snapshot()))
+        self.assertEqual(slice(3, 4), self.container.slices["b"])
+        with self.assertRaises(ValueError):
+            self.container.add("a", [1, 2])
+
+    def test_update_is_visible_in_views(self):
+        view = self.container["a"]
+        self.container.update("a", np.asarray([-1, -2, -3]))
+        self.container.update("b", .5)
+        self.assertIs(view, self.container["a"])
+        self.assertEqual([-1, -2, -3], list(view))
+        self.assertEqual([-1, -2, -3, .5, 0, 0],
+                         list(self.container.snapshot()))
+
+    def test_update_many(self):
+        out = []
+        self.container.set_default_callback(lambda x, y: out.append(x))
+        self.container.update_many(["c", "a"], [[7, 8], [4, 5, 6]])
+        self.container.shutdown()
+        self.assertEqual([4, 5, 6, 4, 7, 8],
+                         list(self.container.snapshot()))
+        self.assertEqual(["a", "c"], sorted(out))
+
+    def test_slot_reads_view(self):
+        slot = self.container.slot("a")
+        self.container.update("a", [3, 2, 1])
+        self.assertIs(self.container["a"], slot.read())
+        self.assertEqual([3, 2, 1], list(slot.read()))
+
+    def test_slots_follow_the_buffer(self):
+        container = ArrayContainer()
+        with nengo.Network():
+            signals = [ControlSignal(container, size, label=str(size))
+                       for size in (2, 3, 1)]
+        for value, signal in enumerate(signals):
+            container.update(signal, np.arange(signal.size_out) + value)
+        snapshot = container.snapshot()
+        for signal in signals:
+            self.assertTrue(np.array_equal(
+                signal.slot.read(), snapshot[container.slices[signal]]))
+            self.assertIs(signal.slot.read(), container[signal])
+            self.assertTrue(np.array_equal(
+                signal.control_signal_output(.001), signal.slot.read()))
+        self.assertEqual([0, 1, 1, 2, 3, 2], list(snapshot))
+
+    def test_snapshot_is_read_only(self):
+        snapshot = self.container.snapshot()
+        with self.assertRaises(ValueError):
+            snapshot[0] = 1.
+        self.assertTrue(np.shares_memory(snapshot, self.container["c"]))
+
+
+class TestDispatchQueue(TestCase):
+    def test_drop_oldest(self):
+        queue = DispatchQueue(max_size=2, overflow=DROP_OLDEST)
+        for value in range(4):
+            queue.put(0, value, None)
+        self.assertEqual([2, 3], [entry[1] for entry in queue.entries])
+        self.assertEqual(4, queue.queued)
+        self.assertEqual(2, queue.dropped)
+
+    def test_coalesce(self):
+        queue = DispatchQueue(max_size=2, overflow=COALESCE)
+        queue.put(0, 0, None)
+        queue.put(1, 0, None)
+        queue.put(0, 1, None)
+        queue.put(2, 0, None)
+        self.assertEqual([[1, 0, None], [2, 0, None]], list(queue.entries))
+        self.assertEqual(1, queue.coalesced)
+        self.assertEqual(1, queue.dropped)
+
+    def test_coalesce_pending(self):
+        queue = DispatchQueue(max_size=10)
+        for value in range(5):
+            queue.put(0, value, None, coalesce=True)
+            queue.put(1, value, None)
+        self.assertEqual(6, len(queue))
+        self.assertEqual([0, 4], queue.get()[:2])
+        queue.put(0, 5, None, coalesce=True)
+        self.assertEqual([0, 5], list(queue.entries)[-1][:2])
+        self.assertEqual(4, queue.coalesced)
+
+    def test_block(self):
+        queue = DispatchQueue(max_size=1, overflow=BLOCK)
+        queue.put(0, 0, None)
+        producer = threading.Thread(target=queue.put, args=(0, 1, None))
+        producer.start()
+        sleep(.1)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(0, queue.get()[1])
+        producer.join(1.)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(1, queue.get()[1])
+        self.assertEqual(0, queue.dropped)
+
+    def test_close(self):
+        queue = DispatchQueue()
+        queue.put(0, 0, None)
+        queue.close()
+        self.assertFalse(queue.put(0, 1, None))
+        self.assertEqual(1, queue.dropped)
+        self.assertEqual(0, queue.get()[1])
+        self.assertIsNone(queue.get())
+
+    def test_clear(self):
+        queue = DispatchQueue()
+        queue.put(0, 0, None)
+        queue.put(1, 0, None)
+        queue.clear()
+        self.assertEqual(0, len(queue))
+        self.assertEqual(2, queue.dropped)
@@ -0,0 +1,45 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_utils.cross_product import CrossProduct, skew
+import nengo
+import numpy as np
+
+A = np.array([.5, -.3, .4])
+B = np.array([-.2, .6, .3])
+
+
+def run(**parameters):
+    with nengo.Network(seed=1) as model:
+        net = CrossProduct(n_neurons=100, seed=2, **parameters)
+        if 'vector_A' not in parameters:
+            nengo.Connection(nengo.Node(A), net.in_A)
+        if 'vector_B' not in parameters:
+            nengo.Connection(nengo.Node(B), net.in_B)
+        probe = nengo.Probe(net.output, synapse=0.03)
+    with nengo.Simulator(model) as sim:
+        sim.run(0.3)
+    return net, sim.data[probe][-1]
+
+
+class TestCrossProduct(TestCase):
+    def test_skew(self):
+        self.assertTrue(np.allclose(np.dot(skew(A), B), np.cross(A, B)))
+
+    def test_cross_product(self):
+        net, output = run()
+        self.assertEqual(len(net.multiplier.ea_ensembles), 6)
+        self.assertEqual(sum(e.n_neurons for e in net.all_ensembles), 600)
+        self.assertTrue(np.allclose(output, np.cross(A, B), atol=.1))
+
+    def test_constant_operand(self):
+        for parameters in (dict(vector_A=A), dict(vector_B=B)):
+            net, output = run(**parameters)
+            self.assertIsNone(net.multiplier)
+            self.assertEqual(sum(e.n_neurons for e in net.all_ensembles),
+                             300)
+            self.assertTrue(np.allclose(output, np.cross(A, B), atol=.1))
+
+    def test_both_constant(self):
+        with self.assertRaises(ValueError):
+            CrossProduct(vector_A=A, vector_B=B, add_to_container=False)
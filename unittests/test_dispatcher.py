@@ -0,0 +1,123 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.dispatcher import BehaviourDispatcher, LISTENING, \
+    INTERRUPTED, GESTURE, IDLE, SPEECH, STOP, RESUME
+from robot_interface.furhat_events import SpeechEvent
+
+
+class FakeRobot(object):
+    def __init__(self):
+        self.calls = []
+
+    def gesture(self):
+        self.calls.append(GESTURE)
+
+    def silence(self):
+        self.calls.append("silence")
+
+    def idle(self):
+        self.calls.append(IDLE)
+
+
+def speech(agent, display=None):
+    return SpeechEvent("action.speech", agent, display)
+
+
+def stop(agent=None):
+    return SpeechEvent("action.speech.stop", agent, None)
+
+
+class TestBehaviourDispatcher(TestCase):
+    def setUp(self):
+        self.luke, self.leia = FakeRobot(), FakeRobot()
+        self.dispatcher = BehaviourDispatcher(
+            dict(agent1=self.luke, agent2=self.leia), default_agent="agent1")
+
+    def clear(self):
+        self.luke.calls, self.leia.calls = [], []
+
+    def test_kind(self):
+        kind = self.dispatcher.kind
+        self.assertEqual(kind(speech("agent1", " Hello, there")), SPEECH)
+        self.assertEqual(kind(speech("agent1", " So, where were we?")),
+                         RESUME)
+        self.assertEqual(kind(speech("agent1", " Hm what was I saying")),
+                         RESUME)
+        self.assertEqual(kind(stop()), STOP)
+        self.assertIsNone(kind(SpeechEvent("sense.user.enter", None, None)))
+
+    def test_conversation(self):
+        self.assertTrue(self.dispatcher.dispatch(speech("agent1")))
+        self.assertEqual(self.luke.calls, [GESTURE])
+        self.assertEqual(self.leia.calls, [IDLE])
+        self.clear()
+
+        self.dispatcher.dispatch(speech("agent2"))
+        self.assertEqual(self.luke.calls, [IDLE])
+        self.assertEqual(self.leia.calls, [GESTURE])
+        self.clear()
+
+        # Whoever was interrupted, the default agent's robot silences
+        self.dispatcher.dispatch(stop("agent2"))
+        self.assertEqual(self.dispatcher.state, INTERRUPTED)
+        self.assertEqual(self.luke.calls, ["silence"])
+        self.assertEqual(self.leia.calls, [IDLE])
+        self.clear()
+
+        # Speech is ignored while interrupted
+        self.assertFalse(self.dispatcher.dispatch(speech("agent1")))
+        self.assertEqual(self.luke.calls + self.leia.calls, [])
+
+        self.dispatcher.dispatch(speech("agent2", " where were we"))
+        self.assertEqual(self.dispatcher.state, LISTENING)
+        self.assertEqual(self.luke.calls, [IDLE])
+        self.assertEqual(self.dispatcher.active, dict())
+
+    def test_stop_without_default_agent(self):
+        dispatcher = BehaviourDispatcher(dict(agent1=self.luke,
+                                              agent2=self.leia))
+        dispatcher.dispatch(speech("agent2"))
+        self.clear()
+        # Furhat does not say who was interrupted: the last speaker silences
+        dispatcher.dispatch(stop())
+        self.assertEqual(self.leia.calls, ["silence"])
+        self.assertEqual(self.luke.calls, [])
+
+    def test_stop_before_speech(self):
+        self.dispatcher.dispatch(stop())
+        self.assertEqual(self.luke.calls, ["silence"])
+        self.assertEqual(self.leia.calls, [IDLE])
+
+    def test_unknown_agent(self):
+        self.assertFalse(self.dispatcher.dispatch(speech("agent9")))
+        self.assertFalse(self.dispatcher.dispatch(
+            SpeechEvent("sense.user.enter", None, None)))
+        self.assertEqual(self.dispatcher.ignored, 2)
+
+    def test_many_robots(self):
+        robots = dict(("agent%d" % index, FakeRobot()) for index in range(50))
+        dispatcher = BehaviourDispatcher(robots)
+        dispatcher.dispatch(speech("agent3"))
+        calls = sum(len(robot.calls) for robot in robots.values())
+        self.assertEqual(calls, 50)
+        for robot in robots.values():
+            robot.calls = []
+        # Only the robots that are not idle are told to idle
+        dispatcher.dispatch(speech("agent7"))
+        self.assertEqual(robots["agent3"].calls, [IDLE])
+        self.assertEqual(robots["agent7"].calls, [GESTURE])
+        self.assertEqual(sum(len(robot.calls) for robot in robots.values()),
+                         2)
+
+    def test_custom_table(self):
+        dispatcher = BehaviourDispatcher(
+            dict(agent1=self.luke),
+            transitions={(LISTENING, SPEECH): ("silence", LISTENING)},
+            event_kinds={"action.gaze": SPEECH})
+        dispatcher.dispatch(SpeechEvent("action.gaze", "agent1", None))
+        self.assertEqual(self.luke.calls, ["silence"])
+
+    def test_unknown_default_agent(self):
+        with self.assertRaises(ValueError):
+            BehaviourDispatcher(dict(agent1=self.luke), default_agent="x")
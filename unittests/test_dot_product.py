@@ -0,0 +1,42 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_utils.dot_product import BatchedDotProduct
+import nengo
+import numpy as np
+
+
+def run(vector, vectors, constant):
+    with nengo.Network(seed=1) as model:
+        net = BatchedDotProduct(n_neurons=100, dimensions=len(vector),
+                                n_products=len(vectors),
+                                vectors=vectors if constant else None,
+                                seed=2)
+        nengo.Connection(nengo.Node(vector), net.in_A)
+        if not constant:
+            nengo.Connection(nengo.Node(np.ravel(vectors)), net.in_B)
+        probe = nengo.Probe(net.output, synapse=0.03)
+    with nengo.Simulator(model) as sim:
+        sim.run(0.3)
+    return net, sim.data[probe][-1]
+
+
+class TestBatchedDotProduct(TestCase):
+    vector = np.array([0.7, 0.7])
+    vectors = np.array([[0.7, 0.7], [0.7, -0.7], [-0.5, -0.3]])
+
+    def test_products(self):
+        net, output = run(self.vector, self.vectors, constant=False)
+        self.assertEqual(net.output.size_out, 3)
+        self.assertEqual(len(net.multiplier.ea_ensembles), 6)
+        self.assertEqual(len(net.adder.ea_ensembles), 3)
+        self.assertTrue(np.allclose(output, np.dot(self.vectors, self.vector),
+                                    atol=.15))
+
+    def test_constant_vectors(self):
+        net, output = run(self.vector, self.vectors, constant=True)
+        self.assertIsNone(net.multiplier)
+        self.assertFalse(hasattr(net, 'in_B'))
+        self.assertEqual(sum(e.n_neurons for e in net.all_ensembles), 300)
+        self.assertTrue(np.allclose(output, np.dot(self.vectors, self.vector),
+                                    atol=.1))
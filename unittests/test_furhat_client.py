@@ -0,0 +1,100 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.furhat_client import EventFramer, FurhatClient, EVENT
+import socket
+import threading
+
+PAYLOAD = '{"agent":"agent1","display":"Hello, there: friend"}'
+
+
+def event(name, payload, size=True):
+    if size:
+        return "EVENT %s %d\n%s" % (name, len(payload), payload)
+    return "EVENT %s\n%s\n" % (name, payload)
+
+
+class TestEventFramer(TestCase):
+    def test_split_anywhere(self):
+        data = "CONNECTED\n" + event("action.speech", PAYLOAD) + \
+            event("action.speech.stop", '{"agent":"agent2"}')
+        for split in range(len(data)):
+            framer = EventFramer()
+            messages = framer.feed(data[:split]) + framer.feed(data[split:])
+            self.assertEqual([m.command for m in messages],
+                             ["CONNECTED", EVENT, EVENT])
+            self.assertEqual(messages[1].name, "action.speech")
+            self.assertEqual(messages[1].payload, PAYLOAD)
+            self.assertEqual(messages[2].payload, '{"agent":"agent2"}')
+            self.assertEqual(len(framer.buffer), 0)
+
+    def test_byte_by_byte(self):
+        framer = EventFramer()
+        messages = []
+        for byte in event("action.speech", PAYLOAD + "\nsecond line"):
+            messages.extend(framer.feed(byte))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].payload, PAYLOAD + "\nsecond line")
+
+    def test_event_without_size(self):
+        framer = EventFramer()
+        messages = framer.feed(event("action.speech", PAYLOAD, size=False))
+        self.assertEqual(messages[0].payload, PAYLOAD)
+
+    def test_bad_size(self):
+        framer = EventFramer(max_size=100)
+        messages = framer.feed("EVENT action.speech 100000\n" +
+                               event("action.speech", PAYLOAD))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(framer.errors, 1)
+
+    def test_unterminated_line(self):
+        framer = EventFramer(max_size=10)
+        framer.feed("x" * 20)
+        self.assertEqual(framer.errors, 1)
+        self.assertEqual(len(framer.buffer), 0)
+
+
+class TestFurhatClient(TestCase):
+    def setUp(self):
+        self.broker, client_side = socket.socketpair()
+        self.received = []
+        self.event = threading.Event()
+
+        def handler(message):
+            self.received.append(message)
+            self.event.set()
+        self.client = FurhatClient(subscriptions=["action.speech"],
+                                   handler=handler,
+                                   connect=lambda address: client_side)
+
+    def tearDown(self):
+        self.client.close()
+        self.broker.close()
+
+    def read_lines(self, count):
+        data = ""
+        while data.count("\n") < count:
+            data += self.broker.recv(4096)
+        return data.splitlines()
+
+    def test_handshake_and_events(self):
+        self.client.start()
+        self.assertEqual(self.read_lines(2),
+                         ["CONNECT myticket Python",
+                          "SUBSCRIBE action.speech"])
+        self.broker.sendall("CONNECTED\n")
+        self.assertTrue(self.client.wait_connected(1.))
+
+        data = event("action.speech", PAYLOAD)
+        self.broker.sendall(data[:7])
+        self.broker.sendall(data[7:])
+        self.assertTrue(self.event.wait(1.))
+        self.assertEqual(self.received[0].payload, PAYLOAD)
+        self.assertEqual(self.client.events, 1)
+
+    def test_close(self):
+        self.client.start()
+        self.client.close()
+        self.assertTrue(self.client.closed)
+        self.assertIn("CLOSE", self.read_lines(3))
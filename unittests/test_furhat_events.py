@@ -0,0 +1,52 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.furhat_client import EventFramer, FurhatMessage, EVENT
+from robot_interface.furhat_events import parse, parse_event, SpeechEvent, \
+    MAX_PAYLOAD
+import json
+import os
+
+TRAFFIC = os.path.join(os.path.dirname(__file__), "data",
+                       "furhat_traffic.txt")
+
+
+class TestFurhatEvents(TestCase):
+    def test_speech(self):
+        event = parse("action.speech",
+                      '{"agent": "agent1", "display": " So: where, were we?",'
+                      ' "text": "<speech/>"}')
+        self.assertEqual(event, SpeechEvent("action.speech", "agent1",
+                                            " So: where, were we?"))
+
+    def test_missing_fields(self):
+        self.assertEqual(parse("action.speech.stop", ' {"agent":"agent2"}\n'),
+                         SpeechEvent("action.speech.stop", "agent2", None))
+        self.assertEqual(parse(None, '{"event_name": "action.speech"}'),
+                         SpeechEvent("action.speech", None, None))
+
+    def test_malformed(self):
+        for payload in ['', '   ', 'agent1', '[1, 2]', '{"agent":"agent1",',
+                        '{"agent": 1}', '{"agent":"a"} trailing',
+                        '{"display":"' + "x" * MAX_PAYLOAD + '"}']:
+            self.assertIsNone(parse("action.speech", payload), payload)
+
+    def test_message(self):
+        message = FurhatMessage(EVENT, "action.speech", '{"agent":"agent2"}')
+        self.assertEqual(parse_event(message).agent, "agent2")
+
+    def test_traffic(self):
+        with open(TRAFFIC, "rb") as traffic:
+            messages = [message for message in
+                        EventFramer().feed(traffic.read())
+                        if message.command == EVENT]
+        self.assertEqual(len(messages), 240)
+        for message in messages:
+            event = parse_event(message)
+            try:
+                fields = json.loads(message.payload)
+            except ValueError:
+                self.assertIsNone(event)
+                continue
+            self.assertEqual(event, SpeechEvent(
+                message.name, fields.get("agent"), fields.get("display")))
@@ -0,0 +1,56 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.launcher import RobotLauncher
+import threading
+import time
+
+
+class FakeSimulator(object):
+    def __init__(self, network, delay=.2, fail=False):
+        if fail:
+            raise IOError("No board")
+        self.thread = threading.current_thread()
+        time.sleep(delay)
+        self.network = network
+        self.dt = 0.001
+        self.ran = False
+
+    def run(self, run_time):
+        self.ran = True
+
+
+class TestRobotLauncher(TestCase):
+    def test_launch_in_parallel(self):
+        launcher = RobotLauncher(dict(luke=dict(delay=.5), leia=dict(delay=.5)),
+                                 simulator_factory=FakeSimulator)
+        robots = launcher.launch()
+
+        self.assertEqual(["leia", "luke"], sorted(robots))
+        luke = robots["luke"].simulation_control.simulator
+        leia = robots["leia"].simulation_control.simulator
+        self.assertIsNot(luke.thread, leia.thread)
+        for name in robots:
+            self.assertGreaterEqual(launcher.timings[name]['simulator'], .5)
+            self.assertIn('network', launcher.timings[name])
+
+        launcher.start()
+        for robot in robots.values():
+            robot.simulation_control.join(1.)
+            self.assertTrue(robot.simulation_control.simulator.ran)
+            self.assertIn('start', launcher.timings["luke"])
+
+    def test_launch_many(self):
+        # The networks are created one at a time, whatever the number of
+        # robots launched together
+        names = ["robot%d" % index for index in range(4)]
+        launcher = RobotLauncher(dict((name, dict(delay=0)) for name in names),
+                                 simulator_factory=FakeSimulator)
+        self.assertEqual(names, sorted(launcher.launch()))
+
+    def test_launch_failure(self):
+        launcher = RobotLauncher(dict(luke=dict(), leia=dict(fail=True)),
+                                 simulator_factory=FakeSimulator)
+        with self.assertRaises(RuntimeError):
+            launcher.launch()
+        self.assertEqual(["luke"], list(launcher.robots))
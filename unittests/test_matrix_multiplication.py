@@ -0,0 +1,95 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_utils.matrix_multiplication import MatrixMultiplication, \
+    multiplication_transforms
+import nengo
+import numpy as np
+
+
+def loop_transforms(matrix_A, matrix_B):
+    # The transforms as MatrixMultiplication used to build them
+    n_pairs = matrix_A.size * matrix_B.shape[1]
+    transform_a = np.zeros((2 * n_pairs, matrix_A.size))
+    transform_b = np.zeros((2 * n_pairs, matrix_B.size))
+    for i in range(matrix_A.shape[0]):
+        for j in range(matrix_A.shape[1]):
+            for k in range(matrix_B.shape[1]):
+                tmp = (j + k * matrix_A.shape[1] + i * matrix_B.size)
+                transform_a[tmp * 2][j + i * matrix_A.shape[1]] = 1
+                transform_b[tmp * 2 + 1][k + j * matrix_B.shape[1]] = 1
+    transform_c = np.zeros((matrix_A.shape[0] * matrix_B.shape[1], n_pairs))
+    for i in range(n_pairs):
+        transform_c[i // matrix_B.shape[0]][i] = 1
+    return transform_a, transform_b, transform_c
+
+
+def effective_transform(connections, size_out, size_in):
+    # The linear map computed by a set of indexed connections
+    transform = np.zeros((size_out, size_in))
+    for connection in connections:
+        rows = np.arange(size_out)[connection.post_slice]
+        cols = np.arange(size_in)[connection.pre_slice]
+        transform[rows, cols] += 1
+    return transform
+
+
+class TestMatrixMultiplication(TestCase):
+    shapes = [((3, 3), (3, 1)), ((2, 3), (3, 4)), ((1, 1), (1, 1)),
+              ((6, 6), (6, 6)), ((4, 2), (2, 5))]
+
+    def test_transforms_match_loops(self):
+        for shape_A, shape_B in self.shapes:
+            expected = loop_transforms(np.zeros(shape_A), np.zeros(shape_B))
+            actual = multiplication_transforms(shape_A, shape_B)
+            for e, a in zip(expected, actual):
+                self.assertEqual(e.shape, a.shape)
+                self.assertEqual(e.tobytes(), a.tobytes())
+
+    def test_sparse_connections_match_loops(self):
+        for shape_A, shape_B in self.shapes:
+            net = MatrixMultiplication(
+                n_neurons=10, matrix_A=np.zeros(shape_A),
+                matrix_B=np.zeros(shape_B), sparse=True,
+                add_to_container=False)
+            transform_a, transform_b, transform_c = loop_transforms(
+                net.matrix_A, net.matrix_B)
+            prod = net.C.product
+
+            def into(pre, post):
+                return [c for c in net.all_connections
+                        if c.pre_obj is pre and c.post_obj is post]
+            self.assertTrue(np.array_equal(effective_transform(
+                into(net.A.output, net.C.input), *transform_a.shape),
+                transform_a))
+            self.assertTrue(np.array_equal(effective_transform(
+                into(net.B.output, net.C.input), *transform_b.shape),
+                transform_b))
+            self.assertTrue(np.array_equal(effective_transform(
+                into(prod, net.D.input), *transform_c.shape), transform_c))
+
+    def test_mismatched_shapes(self):
+        with self.assertRaises(ArithmeticError):
+            MatrixMultiplication(matrix_A=np.zeros((2, 3)),
+                                 matrix_B=np.zeros((2, 1)),
+                                 add_to_container=False)
+
+    def test_sparse_computes_product(self):
+        matrix_A = np.array([[.5, -.5], [.3, .2]])
+        matrix_B = np.array([[.4], [-.6]])
+        outputs = []
+        for sparse in (False, True):
+            with nengo.Network(seed=1) as model:
+                net = MatrixMultiplication(n_neurons=100, matrix_A=matrix_A,
+                                           matrix_B=matrix_B, seed=2,
+                                           sparse=sparse)
+                nengo.Connection(nengo.Node(matrix_A.ravel()), net.in_A)
+                nengo.Connection(nengo.Node(matrix_B.ravel()), net.in_B)
+                probe = nengo.Probe(net.output, synapse=0.03)
+            with nengo.Simulator(model) as sim:
+                sim.run(0.3)
+            outputs.append(sim.data[probe][-1])
+        expected = np.dot(matrix_A, matrix_B).ravel()
+        for output in outputs:
+            self.assertTrue(np.allclose(output, expected, atol=.1))
+        self.assertTrue(np.allclose(outputs[0], outputs[1], atol=1e-6))
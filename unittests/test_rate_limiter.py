@@ -0,0 +1,52 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_models.rate_limiter import RateLimiter, FIXED_RATE, MAX_RATE, \
+    ON_CHANGE
+
+
+class TestRateLimiter(TestCase):
+    def transmissions(self, rate, changes, dt=0.001):
+        return [tick for tick, changed in enumerate(changes)
+                if rate.ready(tick * dt, changed)]
+
+    def test_checks(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+        with self.assertRaises(ValueError):
+            RateLimiter(policy="whenever")
+
+    def test_fixed_rate(self):
+        rate = RateLimiter(15, FIXED_RATE)
+        self.assertEqual([0, 15, 30, 45],
+                         self.transmissions(rate, [False] * 50))
+
+    def test_fixed_rate_keeps_phase(self):
+        rate = RateLimiter(10, FIXED_RATE)
+        self.assertTrue(rate.ready(0.))
+        self.assertTrue(rate.ready(.013))
+        self.assertFalse(rate.ready(.019))
+        self.assertTrue(rate.ready(.020))
+
+    def test_max_rate(self):
+        rate = RateLimiter(10, MAX_RATE)
+        changes = [False] * 30
+        changes[3] = changes[5] = changes[14] = changes[27] = True
+        self.assertEqual([3, 14, 27], self.transmissions(rate, changes))
+
+    def test_on_change(self):
+        rate = RateLimiter(10, ON_CHANGE)
+        changes = [tick % 3 == 0 for tick in range(10)]
+        self.assertEqual([0, 3, 6, 9], self.transmissions(rate, changes))
+
+    def test_dt(self):
+        rate = RateLimiter(10)
+        rate.set_dt(0.0001)
+        self.assertEqual(1000, rate.tick(.1))
+        self.assertEqual([0, 10], self.transmissions(rate, [True] * 20,
+                                                     dt=0.0001))
+
+    def test_exact_ticks(self):
+        rate = RateLimiter(3)
+        # Accumulated time steps are not exact multiples of dt
+        self.assertEqual(300, rate.tick(sum([0.001] * 300)))
@@ -0,0 +1,55 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_control.robot import Robot, arm_names
+import nengo
+import numpy as np
+
+
+class TestRobotNetwork(TestCase):
+    def test_defaults_build_two_arms(self):
+        robot = Robot(seed=1)
+        self.assertEqual(robot.n_arms, 2)
+        self.assertIs(robot.left_target_position, robot.target_positions[0])
+        self.assertIs(robot.right_servos, robot.servo_groups[1])
+        self.assertEqual(sorted(robot.servos.labels.keys()),
+                         ["left_servos", "right_servos"])
+        self.assertEqual(robot.budget()['neurons'], 7750)
+
+    def test_sizes(self):
+        robot = Robot(seed=1, n_arms=3, joints_per_arm=4, n_neurons=20)
+        self.assertEqual(len(robot.servo_groups), 3)
+        self.assertEqual(sorted(robot.servos.labels.keys()),
+                         sorted(name + "_servos" for name in arm_names(3)))
+        for current, error in zip(robot.current_positions, robot.errors):
+            self.assertEqual(current.dimensions, 4)
+            self.assertEqual(error.dimensions, 8)
+            self.assertEqual(error.ea_ensembles[0].n_neurons, 100)
+        self.assertEqual(robot.silence.size_out, 4)
+        self.assertEqual(robot.arm_selector.input.size_in, 3)
+
+    def test_budget_scales_with_neurons(self):
+        small = Robot(seed=1, n_neurons=20).budget()
+        large = Robot(seed=1, n_neurons=40).budget()
+        self.assertEqual(small['ensembles'], large['ensembles'])
+        self.assertEqual(small['connections'], large['connections'])
+        self.assertLess(small['neurons'], large['neurons'])
+        self.assertLess(small['decoders'], large['decoders'])
+
+    def test_feedback_tau(self):
+        robot = Robot(seed=1, n_neurons=20, tau=0.05)
+        self.assertEqual(robot.feedback_tau, 0.1)
+        recurrent = [c for c in robot.all_connections
+                     if c.pre_obj is robot.left_current_position.output and
+                     c.post_obj is robot.left_current_position.input]
+        self.assertEqual(len(recurrent), 1)
+        self.assertEqual(recurrent[0].synapse.tau, 0.1)
+        self.assertEqual(robot.parameters['feedback_tau'], 0.1)
+
+    def test_single_arm_runs(self):
+        robot = Robot(seed=1, n_arms=1, joints_per_arm=2, n_neurons=20)
+        with nengo.Simulator(robot) as sim:
+            sim.run(0.01)
+        self.assertEqual(robot.servos.labels.keys(), ["arm0_servos"])
+        self.assertTrue(np.all(np.isfinite(
+            robot.servos.key_with_label("arm0_servos").last_sent)))
@@ -0,0 +1,57 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_control.robot import Robot
+from robot_interface.alan_robot import AlanRobot
+from robot_utils.dot_product import DotProduct
+from robot_utils.seeding import derive_seed, MAX_SEED
+import nengo
+import numpy as np
+
+
+def decoders(network):
+    model = nengo.builder.Model()
+    model.build(network)
+    return [model.params[connection].weights
+            for connection in network.all_connections
+            if isinstance(connection.pre_obj, nengo.Ensemble)]
+
+
+class TestSeeding(TestCase):
+    def test_derive_seed(self):
+        self.assertIsNone(derive_seed(None, "left"))
+        self.assertEqual(derive_seed(1, "left", "error"),
+                         derive_seed(np.int64(1), "left", "error"))
+        self.assertNotEqual(derive_seed(1, "left"), derive_seed(1, "right"))
+        self.assertNotEqual(derive_seed(1, "left"), derive_seed(2, "left"))
+        self.assertTrue(0 <= derive_seed(1, "left") <= MAX_SEED)
+
+    def test_sub_networks_are_seeded(self):
+        robot = Robot(seed=3, n_neurons=20)
+        self.assertEqual(robot.left_error.seed,
+                         derive_seed(3, "left", "error"))
+        self.assertEqual(robot.bg.seed, derive_seed(3, "bg"))
+        self.assertEqual(robot.arm_dp.adder.seed,
+                         derive_seed(robot.arm_dp.seed, "adder"))
+        unseeded = Robot(n_neurons=20)
+        self.assertIsNone(unseeded.left_error.seed)
+
+    def test_same_seed_same_decoders(self):
+        first = decoders(Robot(seed=3, n_neurons=20))
+        second = decoders(Robot(seed=3, n_neurons=20))
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_independent_of_creation_order(self):
+        with nengo.Network(seed=5) as first:
+            a = DotProduct(n_neurons=20, seed=derive_seed(5, "a"))
+        with nengo.Network(seed=5) as second:
+            nengo.Ensemble(20, 1)
+            b = DotProduct(n_neurons=20, seed=derive_seed(5, "a"))
+        self.assertTrue(np.array_equal(decoders(a)[-1], decoders(b)[-1]))
+
+    def test_alan_robot_seed(self):
+        robot = AlanRobot(simulator_factory=lambda network: network, seed=7,
+                          realtime=False)
+        self.assertEqual(robot.robot.seed, 7)
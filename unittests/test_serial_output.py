@@ -0,0 +1,287 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase, skipIf
+from robot_interface.serial_output import encode, FrameDecoder, START, \
+    SerialWriter, SerialOutputManager, serial_port
+from robot_interface.container import Container
+from robot_models.servo import Servo
+from robot_models.servo_calibration import ServoCalibration
+import nengo
+import numpy as np
+import threading
+import time
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+
+class TestFrames(TestCase):
+    def test_encode(self):
+        frame = encode(np.array([True, False, True]),
+                       np.array([101, 155], dtype=np.uint8))
+        self.assertEqual(list(frame),
+                         [START, 0b101, 101, 155, (5 + 101 + 155) & 0x7F])
+
+    def test_round_trip(self):
+        decoder = FrameDecoder(joints=3)
+        rng = np.random.RandomState(1)
+        for _ in range(100):
+            mask = rng.rand(3) < .5
+            positions = rng.randint(0, 255, np.count_nonzero(mask))
+            frames = decoder.feed(encode(mask, positions))
+            self.assertEqual(len(frames), 1)
+            self.assertTrue(np.array_equal(frames[0][0], mask))
+            self.assertTrue(np.array_equal(frames[0][1][mask], positions))
+        self.assertEqual(decoder.errors, 0)
+
+    def test_resynchronises_after_lost_byte(self):
+        decoder = FrameDecoder(joints=3)
+        first = encode(np.ones(3, dtype=bool), np.array([101, 51, 151]))
+        second = encode(np.ones(3, dtype=bool), np.array([120, 80, 153]))
+        # The second position of the first frame is lost
+        data = first[:3] + first[4:] + second
+        frames = decoder.feed(data)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(list(frames[0][1]), [120, 80, 153])
+        self.assertEqual(decoder.errors, 1)
+
+    def test_split_across_reads(self):
+        decoder = FrameDecoder(joints=3)
+        frame = encode(np.array([False, True, False]), np.array([60]))
+        self.assertEqual(decoder.feed(frame[:2]), [])
+        frames = decoder.feed(frame[2:])
+        self.assertEqual(list(frames[0][1]), [0, 60, 0])
+
+    def test_corrupted_byte(self):
+        decoder = FrameDecoder(joints=3)
+        frame = encode(np.ones(3, dtype=bool), np.array([101, 51, 151]))
+        frame[3] = 52
+        self.assertEqual(decoder.feed(frame), [])
+        self.assertEqual(decoder.errors, 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            encode(np.ones(3, dtype=bool), np.array([1, 2]))
+        with self.assertRaises(ValueError):
+            encode(np.ones(1, dtype=bool), np.array([START]))
+        with self.assertRaises(ValueError):
+            encode(np.ones(8, dtype=bool), np.arange(8))
+
+
+class FakeLink(object):
+    def __init__(self, delay=0., failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.data = bytearray()
+        self.closed = False
+
+    def write(self, frame):
+        time.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError("Unplugged")
+        self.data += frame
+        return len(frame)
+
+    def close(self):
+        self.closed = True
+
+
+class Serial2(FakeLink):
+    # Same signature as serial.Serial in pyserial 2.7, which has no **kwargs,
+    # so a keyword it does not know is a TypeError
+    def __init__(self, port=None, baudrate=9600, bytesize=8, parity='N',
+                 stopbits=1, timeout=None, xonxoff=False, rtscts=False,
+                 writeTimeout=None, dsrdtr=False, interCharTimeout=None):
+        super(Serial2, self).__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.writeTimeout = writeTimeout
+
+
+def wait_for(condition, timeout=2.):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(.01)
+
+
+class TestSerialWriter(TestCase):
+    def test_writes_frames(self):
+        link = FakeLink()
+        writer = SerialWriter(lambda: link)
+        writer.start()
+        writer.send("left", np.array([True, True, False]), [101, 60])
+        wait_for(lambda: writer.stats['frames'] == 1)
+        writer.stop(1.)
+        frames = FrameDecoder(3).feed(link.data)
+        self.assertEqual([list(values) for _, values in frames],
+                         [[101, 60, 0]])
+        stats = writer.stats
+        self.assertEqual(stats['bytes'], 5)
+        self.assertEqual(stats['connections'], 1)
+        self.assertGreater(stats['bytes_per_second'], 0)
+        self.assertTrue(link.closed)
+
+    def test_send_never_blocks_and_merges(self):
+        link = FakeLink(delay=.2)
+        writer = SerialWriter(lambda: link)
+        writer.start()
+        writer.send("left", np.array([True, False, False]), [101])
+        wait_for(lambda: writer.stats['queue_depth'] == 0)
+        start = time.time()
+        # The writer is busy with the first frame
+        writer.send("left", np.array([True, False, False]), [110])
+        writer.send("left", np.array([False, True, False]), [70])
+        writer.send("left", np.array([True, False, False]), [120])
+        self.assertLess(time.time() - start, .1)
+        self.assertEqual(writer.stats['queue_depth'], 1)
+        self.assertEqual(writer.stats['merged'], 2)
+        writer.stop(1.)
+        frames = FrameDecoder(3).feed(link.data)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(list(frames[1][0]), [True, True, False])
+        self.assertEqual(list(frames[1][1]), [120, 70, 0])
+
+    def test_reconnects_with_backoff(self):
+        links = []
+
+        def connect():
+            if len(links) < 2:
+                links.append(FakeLink(failures=1))
+            else:
+                links.append(FakeLink())
+            return links[-1]
+        writer = SerialWriter(connect, min_backoff=.01, max_backoff=.02)
+        writer.start()
+        writer.send("right", np.ones(3, dtype=bool), [120, 80, 153])
+        wait_for(lambda: writer.stats['frames'] == 1)
+        writer.stop(1.)
+        self.assertEqual(len(links), 3)
+        self.assertTrue(links[0].closed)
+        self.assertEqual(writer.stats['errors'], 2)
+        frames = FrameDecoder(3).feed(links[2].data)
+        self.assertEqual(list(frames[0][1]), [120, 80, 153])
+
+    def test_unavailable_port(self):
+        def connect():
+            raise IOError("No such port")
+        writer = SerialWriter(connect, min_backoff=.01, max_backoff=.01)
+        writer.start()
+        writer.send("left", np.ones(3, dtype=bool), [1, 2, 3])
+        wait_for(lambda: writer.stats['errors'] >= 3)
+        self.assertEqual(writer.stats['queue_depth'], 1)
+        writer.stop(1.)
+        self.assertFalse(writer.is_alive())
+
+
+    def test_update_sends_changed_joints(self):
+        link = FakeLink()
+        writer = SerialWriter(lambda: link)
+        writer.start()
+        writer.update("left", [101, 51, 151])
+        wait_for(lambda: writer.stats['frames'] == 1)
+        writer.update("left", [101, 60, 151])
+        writer.update("left", [101, 60, 151])
+        wait_for(lambda: writer.stats['queue_depth'] == 0)
+        writer.stop(1.)
+        frames = FrameDecoder(3).feed(link.data)
+        self.assertEqual([[True] * 3, [False, True, False]],
+                         [list(mask) for mask, _ in frames])
+        self.assertEqual(list(frames[-1][1]), [0, 60, 0])
+
+    def test_coalesced_servo_updates_reach_the_link(self):
+        # Two servo updates with disjoint masks are coalesced in the
+        # container, so the callback only sees the mask of the second
+        link = FakeLink()
+        writer = SerialWriter(lambda: link)
+        writer.start()
+        calibration = ServoCalibration([[0, 200]] * 3)
+        gate = threading.Event()
+        delivered = []
+
+        def callback(key, value):
+            if key == "busy":
+                gate.wait()
+                return
+            delivered.append(list(value.mask))
+            writer.update(key, calibration.positions(value.values))
+        container = Container(default_callback=callback, workers=1,
+                              coalesce=True)
+        with nengo.Network():
+            servo = Servo(container, size_in=3, sampling_period=1, delta=.1)
+        container.update(servo, container[servo])
+        wait_for(lambda: writer.stats['frames'] == 1)
+
+        container.update("busy", None)
+        servo.servo_output(.001, np.asarray([.5, 0, 0]))
+        servo.servo_output(.002, np.asarray([.5, .5, 0]))
+        gate.set()
+        container.shutdown(1.)
+        wait_for(lambda: writer.stats['queue_depth'] == 0)
+        writer.stop(1.)
+
+        self.assertEqual(delivered[-1], [False, True, False])
+        frames = FrameDecoder(3).feed(link.data)
+        self.assertEqual(list(frames[-1][0]), [True, True, False])
+        self.assertEqual(list(frames[-1][1]), [150, 150, 0])
+
+    def test_error_stops_writer(self):
+        def connect():
+            raise TypeError("Unexpected keyword argument")
+        writer = SerialWriter(connect, min_backoff=.01)
+        writer.start()
+        writer.send("left", np.ones(3, dtype=bool), [1, 2, 3])
+        writer.join(1.)
+        self.assertFalse(writer.is_alive())
+        self.assertIsInstance(writer.failure, TypeError)
+        with self.assertRaises(RuntimeError):
+            writer.send("left", np.ones(3, dtype=bool), [1, 2, 3])
+
+
+class TestSerialPort(TestCase):
+    def test_port_factory(self):
+        connect = serial_port(4, serial_class=Serial2)
+        link = connect()
+        self.assertEqual(link.port, 4)
+        self.assertEqual(link.baudrate, 57600)
+        self.assertEqual(link.writeTimeout, .1)
+
+        writer = SerialWriter(connect)
+        writer.start()
+        writer.send("left", np.ones(3, dtype=bool), [101, 51, 151])
+        wait_for(lambda: writer.stats['frames'] == 1)
+        writer.stop(1.)
+        self.assertIsNone(writer.failure)
+        self.assertEqual(writer.stats['connections'], 1)
+
+    @skipIf(serial is None, "pyserial is not installed")
+    def test_pyserial(self):
+        # A port of None is not opened, so this only checks the parameters
+        link = serial_port(None)()
+        self.assertEqual(link.baudrate, 57600)
+        self.assertEqual(link.writeTimeout, .1)
+
+
+class TestSerialOutputManager(TestCase):
+    def test_routes_to_ports(self):
+        links = dict(port1=FakeLink(), port2=FakeLink())
+        manager = SerialOutputManager()
+        for port, link in links.items():
+            manager.add_port(port, lambda link=link: link)
+        manager.route("left", "port1")
+        manager.route("right", "port2")
+        manager.send("left", np.ones(3, dtype=bool), [101, 51, 151])
+        manager.send("right", np.array([False, False, True]), [155])
+        wait_for(lambda: all(stats['frames'] == 1 for stats in
+                             manager.stats.values()))
+        manager.close(1.)
+        self.assertEqual(
+            list(FrameDecoder(3).feed(links['port1'].data)[0][1]),
+            [101, 51, 151])
+        self.assertEqual(
+            list(FrameDecoder(3).feed(links['port2'].data)[0][1]),
+            [0, 0, 155])
+        with self.assertRaises(ValueError):
+            manager.add_port("port1", lambda: None)
@@ -0,0 +1,63 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.container import Container
+from robot_models.servo import Servo
+from robot_models.rate_limiter import MAX_RATE
+import nengo
+import numpy as np
+
+
+class TestServo(TestCase):
+    def setUp(self):
+        self.container = Container()
+        self.network = nengo.Network()
+        with self.network:
+            self.servo = Servo(self.container, size_in=3, sampling_period=1,
+                               delta=.1)
+
+    def test_initial_value(self):
+        update = self.container[self.servo]
+        self.assertEqual([False] * 3, list(update.mask))
+        self.assertEqual([0] * 3, list(update.values))
+
+    def test_only_changed_joints(self):
+        self.servo.servo_output(0., np.asarray([.5, .05, -.2]))
+        update = self.container[self.servo]
+        self.assertEqual([True, False, True], list(update.mask))
+        self.assertEqual([.5, 0, -.2], list(update.values))
+
+    def test_no_update_inside_deadband(self):
+        self.servo.servo_output(0., np.asarray([.05, .05, .05]))
+        self.assertFalse(self.container[self.servo].mask.any())
+
+    def test_hysteresis(self):
+        self.servo.servo_output(0., np.asarray([.2, 0, 0]))
+        # Moving joint keeps being sent for changes above delta * hysteresis
+        self.servo.servo_output(.001, np.asarray([.26, .06, 0]))
+        update = self.container[self.servo]
+        self.assertEqual([True, False, False], list(update.mask))
+        self.assertEqual([.26, 0, 0], list(update.values))
+        # ... and stops once the changes drop below it
+        self.servo.servo_output(.002, np.asarray([.28, 0, 0]))
+        self.servo.servo_output(.003, np.asarray([.35, 0, 0]))
+        self.assertEqual(.26, self.container[self.servo].values[0])
+
+    def test_sampling_period(self):
+        with self.network:
+            servo = Servo(self.container, size_in=1, sampling_period=15)
+        servo.servo_output(0., np.asarray([1.]))
+        servo.servo_output(.005, np.asarray([2.]))
+        self.assertEqual([1.], list(self.container[servo].values))
+        servo.servo_output(.015, np.asarray([2.]))
+        self.assertEqual([2.], list(self.container[servo].values))
+
+    def test_max_rate(self):
+        with self.network:
+            servo = Servo(self.container, size_in=1, sampling_period=10,
+                          policy=MAX_RATE)
+        servo.servo_output(0., np.asarray([0.]))
+        servo.servo_output(.012, np.asarray([1.]))
+        self.assertEqual([1.], list(self.container[servo].values))
+        servo.servo_output(.020, np.asarray([2.]))
+        self.assertEqual([1.], list(self.container[servo].values))
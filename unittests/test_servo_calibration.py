@@ -0,0 +1,72 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_models.servo_calibration import ServoCalibration
+from robot_interface.serial_output import MAX_POSITION, encode
+import numpy as np
+
+RANGES = {0: [101, 150], 1: [51, 100], 2: [151, 155]}
+
+
+def interpolate(value, servo_range, radius=1.):
+    # The per joint conversion the calibration replaces (scipy's interp1d)
+    slope = (servo_range[1] - servo_range[0]) / (radius - -radius)
+    value = min(max(value, -radius), radius)
+    return int(slope * (value - -radius) + servo_range[0])
+
+
+class TestServoCalibration(TestCase):
+    def test_matches_interpolation(self):
+        calibration = ServoCalibration(RANGES)
+        for values in np.random.RandomState(1).uniform(-1.5, 1.5, (500, 3)):
+            positions = calibration.positions(values)
+            self.assertEqual(positions.dtype, np.uint8)
+            self.assertEqual(list(positions),
+                             [interpolate(value, RANGES[joint])
+                              for joint, value in enumerate(values)])
+
+    def test_extremes(self):
+        calibration = ServoCalibration(RANGES, radius=2.)
+        self.assertEqual(list(calibration.positions([-5, -2, -2])),
+                         [101, 51, 151])
+        self.assertEqual(list(calibration.positions([2, 5, 2])),
+                         [150, 100, 155])
+
+    def test_selected_joints(self):
+        calibration = ServoCalibration(RANGES)
+        values = np.array([0., 1., -1.])
+        self.assertEqual(list(calibration.positions(values, [1, 2])),
+                         [100, 151])
+        self.assertEqual(list(calibration.positions(values, np.array([0]))),
+                         [125])
+
+    def test_lookup_table(self):
+        exact = ServoCalibration(RANGES)
+        table = ServoCalibration(RANGES, resolution=1001)
+        self.assertEqual(table.table.shape, (3, 1001))
+        levels = np.linspace(-1, 1, 1001)
+        for level in levels[::50]:
+            values = np.repeat(level, 3)
+            self.assertEqual(list(table.positions(values)),
+                             list(exact.positions(values)))
+        values = np.random.RandomState(1).uniform(-1, 1, (200, 3))
+        for row in values:
+            difference = table.positions(row).astype(int) - \
+                exact.positions(row).astype(int)
+            self.assertTrue(np.all(np.abs(difference) <= 1))
+
+    def test_largest_position_can_be_sent(self):
+        calibration = ServoCalibration([[0, MAX_POSITION]] * 3,
+                                       max_position=MAX_POSITION)
+        positions = calibration.positions(np.ones(3))
+        self.assertEqual([MAX_POSITION] * 3, list(positions))
+        encode(np.ones(3, dtype=bool), positions)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            ServoCalibration([[0, 300]])
+        # 255 is the start byte of the serial frames
+        with self.assertRaises(ValueError):
+            ServoCalibration([[0, 255]], max_position=MAX_POSITION)
+        with self.assertRaises(ValueError):
+            ServoCalibration(RANGES, resolution=1)
@@ -0,0 +1,51 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_interface.simulation_control import SimulationControl
+import time
+
+
+class FakeSimulator(object):
+    def __init__(self, step_time=0.):
+        self.dt = 0.001
+        self.n_steps = 0
+        self.chunks = []
+        self.step_time = step_time
+
+    def run_steps(self, steps, progress_bar=True):
+        time.sleep(steps * self.step_time)
+        self.chunks.append(steps)
+        self.n_steps += steps
+
+
+class TestSimulationControl(TestCase):
+    def test_chunks(self):
+        simulator = FakeSimulator()
+        control = SimulationControl(simulator, run_time=.25, chunk_steps=100)
+        control.run()
+        self.assertEqual([100, 100, 50], simulator.chunks)
+        self.assertAlmostEqual(.25, control.simulated_time)
+
+    def test_as_fast_as_possible(self):
+        control = SimulationControl(FakeSimulator(), run_time=10.)
+        control.run()
+        self.assertGreater(control.realtime_factor, 10.)
+
+    def test_realtime(self):
+        control = SimulationControl(FakeSimulator(), run_time=.3,
+                                    chunk_steps=50, realtime=True)
+        start = time.time()
+        control.run()
+        self.assertGreaterEqual(time.time() - start, .29)
+        self.assertAlmostEqual(1., control.realtime_factor, delta=.1)
+
+    def test_stop_within_a_chunk(self):
+        simulator = FakeSimulator(step_time=0.0001)
+        control = SimulationControl(simulator, chunk_steps=100)
+        self.assertIsNone(control.realtime_factor)
+        control.start()
+        time.sleep(.1)
+        control.stop()
+        control.join(.1)
+        self.assertFalse(control.is_alive())
+        self.assertEqual(0, simulator.n_steps % 100)
@@ -0,0 +1,89 @@
+__author__ = 'Petrut Bogdan'
+
+from unittest import TestCase
+from robot_models.stream_probe import StreamProbe, load_stream, segments
+from robot_control.robot import Robot
+import nengo
+import numpy as np
+import shutil
+import tempfile
+
+
+def load(directory):
+    times, values = zip(*load_stream(directory))
+    return np.concatenate(times), np.concatenate(values)
+
+
+class TestStreamProbe(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_segments(self):
+        with nengo.Network():
+            probe = StreamProbe(self.directory, size_in=2, decimation=2,
+                                chunk_size=4, segment_size=4 * 3 * 8)
+        for tick in range(20):
+            probe.probe_output(tick * 0.001, np.asarray([tick, -tick]))
+
+        self.assertEqual(2, len(segments(self.directory)))
+        self.assertEqual(2, probe.rows)
+        probe.flush()
+        times, values = load(self.directory)
+        self.assertEqual(range(0, 20, 2), list(np.round(times * 1000)))
+        self.assertEqual(range(0, 20, 2), list(values[:, 0]))
+        self.assertEqual(range(0, -20, -2), list(values[:, 1]))
+
+    def test_memory_is_bounded(self):
+        with nengo.Network():
+            probe = StreamProbe(self.directory, size_in=1, decimation=1,
+                                chunk_size=10, segment_size=1000)
+        buffer = probe.buffer
+        for tick in range(1000):
+            probe.probe_output(tick * 0.001, np.asarray([tick]))
+        self.assertIs(buffer, probe.buffer)
+        # 16 bytes per sample, so a segment is 70 samples
+        self.assertEqual(15, len(segments(self.directory)))
+
+    def test_segments_are_read_lazily(self):
+        with nengo.Network():
+            probe = StreamProbe(self.directory, size_in=1, decimation=1,
+                                chunk_size=10, segment_size=160)
+        for tick in range(25):
+            probe.probe_output(tick * 0.001, np.asarray([tick]))
+        stream = load_stream(self.directory)
+        times, values = next(stream)
+        self.assertIsInstance(values.base, np.memmap)
+        self.assertEqual(range(10), list(values[:, 0]))
+        # The samples still in memory are not read
+        times, values = next(stream)
+        self.assertEqual(range(10, 20), list(values[:, 0]))
+        with self.assertRaises(StopIteration):
+            next(stream)
+        probe.flush()
+        self.assertEqual(range(25), list(load(self.directory)[1][:, 0]))
+
+    def test_appends_to_previous_run(self):
+        for run in range(2):
+            with nengo.Network():
+                probe = StreamProbe(self.directory, size_in=1, decimation=1)
+            probe.probe_output(0., np.asarray([run]))
+            probe.flush()
+        times, values = load(self.directory)
+        self.assertEqual([0, 1], list(values[:, 0]))
+        self.assertEqual(2, len(segments(self.directory)))
+        with self.assertRaises(ValueError):
+            with nengo.Network():
+                StreamProbe(self.directory, size_in=2)
+
+    def test_robot_streams(self):
+        robot = Robot(seed=1)
+        probes = robot.stream(self.directory, decimation=5)
+        self.assertIn('action_thalamus', probes)
+        with nengo.Simulator(robot) as simulator:
+            simulator.run(.05, progress_bar=False)
+        robot.flush_streams()
+        times, values = load(probes['left_servos'].directory)
+        self.assertEqual((10, 3), values.shape)